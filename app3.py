@@ -1,16 +1,14 @@
 import streamlit as st
 import re
-import shutil
 import zipfile
 from pathlib import Path
 import pandas as pd
-import torch
+from code.artifact_cache import ArtifactCache
 from code.audio_extractor import AudioExtractor
-from code.audio_transcriber import AudioTranscriber
 from code.options import whisper_languages, whisper_models
-from code.audio_cloner.src.f5_tts.api import F5TTS
-from code.thumbnail_generator import add_thumbnail_to_video
-from code.text_processor import process_text,apply_replacements_to_transcription
+from code.model_worker import ModelClient
+from code.thumbnail_generator import render_thumbnail
+from code.text_processor import apply_replacements_to_transcription
 
 # --- Constants ---
 CACHE_DIR = Path(".cache")
@@ -31,34 +29,37 @@ def save_uploaded_file(uploaded_file):
     return file_path
 
 
-def reset_cache_dir():
-    print("cleaning...")
-    if CACHE_DIR.exists():
-        shutil.rmtree(CACHE_DIR)
-    CACHE_DIR.mkdir()
-    torch.cuda.empty_cache()
+@st.cache_resource
+def artifact_cache():
+    """Content-addressed cache shared with the model worker, survives model changes."""
+    return ArtifactCache()
 
 
-def load_models(selected_language, selected_model_variant, selected_gpu):
-    """Initialize all models with selected parameters."""
+@st.cache_resource
+def connect_worker(device=None):
+    """Connect to the model worker, starting it on ``device`` once per app process if needed."""
+    return ModelClient.connect(device=device)
+
 
-    reset_cache_dir()  # Ensure clean directory
+def load_models(selected_language, selected_model_variant, selected_gpu):
+    """Warm up the worker's models with selected parameters, they stay loaded across runs."""
 
     # Load all models with a spinner to show loading state
     with st.spinner(f"Loading models for {selected_language} on {selected_gpu}..."):
 
-        transcriber = AudioTranscriber(
-            language=selected_language,
+        device = selected_gpu.lower()
+        client = ModelClient(connect_worker(device).url).load_transcriber(
+            language=LANGUAGE_OPTIONS[selected_language],
             model_name=f"openai/whisper-{selected_model_variant}",
-            device=selected_gpu.lower(),
+            device=device,
         )
 
-    return transcriber
+    return client
 
 
 def get_gpu_setting():
-    """Determine GPU availability."""
-    return "CUDA" if torch.cuda.is_available() else "CPU"
+    """Determine GPU availability of the model worker."""
+    return "CUDA" if connect_worker().health()["cuda"] else "CPU"
 
 
 def reset_state_on_change(new_method, new_params):
@@ -102,8 +103,8 @@ def main():
         selected_gpu = "CPU"
 
     # Initialize session state
-    if "transcriber" not in st.session_state:
-        st.session_state["transcriber"] = None
+    if "client" not in st.session_state:
+        st.session_state["client"] = None
         st.session_state["model_params"] = {
             "language": None,
             "transcription_model_variant": None,
@@ -143,10 +144,10 @@ def main():
 
     # Load models if needed
     if (
-        st.session_state["transcriber"] is None
+        st.session_state["client"] is None
         or st.session_state["model_params"] != current_params
     ):
-        st.session_state["transcriber"] = load_models(
+        st.session_state["client"] = load_models(
             selected_language,
             selected_model_variant,
             selected_gpu,
@@ -179,16 +180,12 @@ def main():
         st.session_state["audio_file_path"] = file_path
         with st.spinner("Processing file..."):
             if option == "Upload Video":
-                audio_file_path = AudioExtractor(
-                    file_path, f"{file_path}.wav"
-                ).extract_audio()
-                st.session_state["audio_file_path"] = audio_file_path
                 st.session_state["video_file_path"] = file_path
 
-            # Use Transcriber to process uploaded file
-            st.session_state["transcription"] = st.session_state[
-                "transcriber"
-            ].transcribe_file(st.session_state["audio_file_path"])
+            # Use the worker's transcriber on the uploaded file, timed words also locate spans for partial regeneration
+            result = st.session_state["client"].transcribe(file_path)
+            st.session_state["word_times"] = result["words"]
+            st.session_state["transcription"] = result["transcription"]
         st.success("Transcription completed successfully!")
 
     # Show transcription and editable data only after file is uploaded/processed
@@ -196,7 +193,9 @@ def main():
         st.subheader("Transcription", divider="orange")
         st.code(body=st.session_state["transcription"], language=None, wrap_lines=True)
         words = CLEAN_SENTENCE(st.session_state["transcription"])
-        allowed_words, disallowed_words = process_text(st.session_state["transcription"], selected_language)
+        allowed_words, disallowed_words = st.session_state["client"].process_text(
+            st.session_state["transcription"], LANGUAGE_OPTIONS[selected_language]
+        )
         
         st.subheader("Edit Transcription", divider="orange")
 
@@ -326,6 +325,10 @@ def main():
 
         # Display the list of generated videos or audio files
         if st.session_state["processed_transcription_list"]:
+            partial_regeneration = st.checkbox(
+                "Only regenerate replaced words",
+                help="Keeps the original audio and resynthesizes just the edited spans.",
+            )
             # Generate new videos or audio files only when the button is clicked
             if st.button("Let's Create Videos", use_container_width=True):
                 processed_transcription_list = st.session_state[
@@ -337,40 +340,52 @@ def main():
                 progress_bar = st.progress(0)
 
                 with st.spinner("Generating Videos..."):
-                    cloner = F5TTS(model_type="F5-TTS", device=selected_gpu.lower())
-                    for idx, processed_transcription in enumerate(
-                        processed_transcription_list
-                    ):
-                        # Update the existing progress bar
+                    final_names = []
+                    for processed_transcription in processed_transcription_list:
                         changed_words = CLEAN_SENTENCE(processed_transcription)
                         different_words = [w for w in changed_words if w not in words]
                         different_words = (
                             ["default"] if different_words == [] else different_words
                         )
-                        final_name = f"{CACHE_OUTPUT_DIR}/{'_'.join(different_words)}"
-
-                        # Generate the audio or video file
-                        wav, sr, spect = cloner.infer(
-                            ref_file=st.session_state["audio_file_path"],
-                            ref_text=st.session_state["transcription"],
-                            gen_text=processed_transcription,
-                            file_wave=f"{final_name}.wav",
-                        )
+                        final_names.append(f"{CACHE_OUTPUT_DIR}/{'_'.join(different_words)}")
 
-                        # Update progress bar based on the iteration index
-                        progress_bar.progress(
-                            (idx + 1) / len(processed_transcription_list)
+                    if option == "Upload Video":
+                        extractor = AudioExtractor(
+                            input_video=st.session_state["video_file_path"],
+                            output_audio="final_cache.wav",
                         )
+                    # The worker streams back each variant as soon as its audio is written,
+                    # partial regeneration infills only the replaced words and keeps the rest
+                    results = st.session_state["client"].synthesize(
+                        media=st.session_state["audio_file_path"],
+                        ref_text=st.session_state["transcription"],
+                        gen_texts=processed_transcription_list,
+                        file_waves=[f"{final_name}.wav" for final_name in final_names],
+                        word_times=st.session_state["word_times"] if partial_regeneration else None,
+                    )
+                    for idx, result in enumerate(results):
+                        final_name = final_names[result["index"]]
+                        # Update progress bar based on the iteration index
+                        progress_bar.progress((idx + 1) / len(final_names))
 
                         if option == "Upload Video":
-                            final_file = AudioExtractor(
-                                input_video=st.session_state["video_file_path"],
-                                output_audio="final_cache.wav",
-                            ).replace_audio(f"{final_name}.wav", f"{final_name}.mp4")
-                            add_thumbnail_to_video(
-                                final_name.split("/")[-1].replace("_", " "),
-                                f"{final_name}.mp4",
+                            # New audio and thumbnail are muxed in one ffmpeg pass, unless this
+                            # exact video, audio and thumbnail were muxed before
+                            cache = artifact_cache()
+                            thumbnail_text = final_name.split("/")[-1].replace("_", " ")
+                            cache_key = cache.key(
+                                "video",
+                                video=cache.hash_file(extractor.input_video),
+                                audio=cache.hash_file(f"{final_name}.wav"),
+                                thumbnail=thumbnail_text,
                             )
+                            if not cache.fetch(cache_key, ".mp4", f"{final_name}.mp4"):
+                                extractor.finalize_variant(
+                                    f"{final_name}.wav",
+                                    f"{final_name}.mp4",
+                                    render_thumbnail(thumbnail_text),
+                                )
+                                cache.put(cache_key, ".mp4", f"{final_name}.mp4")
                             generated_files.append(f"{final_name}.mp4")
                         elif option == "Upload Audio":
                             final_file = f"{final_name}.wav"
@@ -0,0 +1,194 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ARTIFACT_CACHE_DIR", str(Path(__file__).resolve().parent.parent / ".artifacts")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 10 * 1024**3))
+
+
+class ArtifactCache:
+    """
+    Disk cache for pipeline artifacts, addressed by the content they derive from.
+
+    Keys hash the kind of artifact together with everything that determines it: the
+    content hash of the input media (not its path, so a re-upload under another name
+    still hits), the model and language settings, and the generation parameters.
+    Entries are plain files under ``root``, so the worker, the app and the CLI share
+    them. Every hit refreshes the entry's mtime and the least recently used entries
+    are evicted once the cache grows past ``max_bytes``.
+
+    Args:
+        root (str): Directory holding the entries.
+        max_bytes (int): Size the cache is trimmed back to after each store.
+        max_file_hashes (int): Number of media content hashes kept in memory.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_file_hashes: int = 256,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_file_hashes = max_file_hashes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file_hashes = OrderedDict()
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    @staticmethod
+    def key(kind: str, **params) -> str:
+        """Hash an artifact kind and the JSON-serializable parameters it depends on."""
+        payload = json.dumps({"kind": kind, **params}, sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+    def hash_file(self, path: Union[str, Path]) -> str:
+        """Return the SHA-256 of a file's content, remembered per path, size and mtime."""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._file_hashes:
+                self._file_hashes.move_to_end(memo_key)
+                return self._file_hashes[memo_key]
+        # hashed outside the lock so reading a long video doesn't stall other lookups
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._file_hashes[memo_key] = digest.hexdigest()
+            if len(self._file_hashes) > self.max_file_hashes:
+                self._file_hashes.popitem(last=False)
+        return digest.hexdigest()
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.root / key[-2:] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """Return the path of a cached entry and mark it as recently used, or None."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key: str, suffix: str, source: Union[str, Path]) -> Path:
+        """Copy a file into the cache under ``key``."""
+        return self._store(key, suffix, lambda tmp: shutil.copyfile(source, tmp))
+
+    def fetch(self, key: str, suffix: str, destination: Union[str, Path]) -> bool:
+        """Copy a cached entry to ``destination``, returning whether it was cached."""
+        path = self.get(key, suffix)
+        if path is None:
+            return False
+        shutil.copyfile(path, destination)
+        return True
+
+    def get_json(self, key: str) -> Optional[Any]:
+        path = self.get(key, ".json")
+        if path is None:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put_json(self, key: str, value: Any) -> Path:
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+
+        return self._store(key, ".json", write)
+
+    def get_arrays(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self.get(key, ".npz")
+        if path is None:
+            return None
+        with np.load(path) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+
+    def put_arrays(self, key: str, arrays: Dict[str, np.ndarray]) -> Path:
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+
+        return self._store(key, ".npz", write)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _store(self, key: str, suffix: str, write) -> Path:
+        # write next to the entry and rename, so concurrent readers never see a partial file
+        path = self.path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp)
+            replaced = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            self._size += path.stat().st_size - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _entries(self):
+        return (
+            entry
+            for entry in self.root.glob("*/*")
+            if entry.is_file() and entry.suffix != ".tmp"
+        )
+
+    def _evict(self):
+        # rescan, other processes may have added or evicted entries since
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            logging.info(f"Evicted {entry.name} from the artifact cache")
@@ -9,10 +9,19 @@ from cached_path import cached_path
 
 from f5_tts.model import DiT, UNetT
 from f5_tts.model.utils import seed_everything
+from f5_tts.infer.batch_scheduler import BatchScheduler
+from f5_tts.infer.snippet_cache import SnippetCache
 from f5_tts.infer.utils_infer import (
     load_vocoder,
     load_model,
     infer_process,
+    infer_many_process,
+    infer_stream_process,
+    locate_edit_parts,
+    edit_contexts,
+    edit_windows,
+    edit_process,
+    transcribe_word_timestamps,
     remove_silence_for_generated_wav,
     save_spectrogram,
 )
@@ -36,6 +45,7 @@ class F5TTS:
         self.hop_length = 256
         self.target_rms = 0.1
         self.seed = -1
+        self.snippet_cache = None
 
         # Set device
         self.device = device or (
@@ -47,7 +57,12 @@ class F5TTS:
         self.load_ema_model(model_type, ckpt_file, vocab_file, ode_method, use_ema)
 
     def load_vocoder_model(self, local_path):
-        self.vocos = load_vocoder(local_path is not None, local_path, self.device)
+        # loaded on first use from the process-wide registry, instances on the same path and device share it
+        self.vocoder_local_path = local_path
+
+    @property
+    def vocos(self):
+        return load_vocoder(self.vocoder_local_path is not None, self.vocoder_local_path, self.device)
 
     def load_ema_model(self, model_type, ckpt_file, vocab_file, ode_method, use_ema):
         if model_type == "F5-TTS":
@@ -111,6 +126,202 @@ class F5TTS:
             sway_sampling_coef=sway_sampling_coef,
             speed=speed,
             fix_duration=fix_duration,
+            vocoder=self.vocos,
+            device=self.device,
+        )
+
+        if file_wave is not None:
+            self.export_wav(wav, file_wave, remove_silence)
+
+        if file_spect is not None:
+            self.export_spectrogram(spect, file_spect)
+
+        return wav, sr, spect
+
+    # yields (wave block, sample rate) as each chunk is vocoded, the blocks concatenate to what infer() returns
+
+    def infer_stream(
+        self,
+        ref_file,
+        ref_text,
+        gen_text,
+        show_info=print,
+        progress=tqdm,
+        target_rms=0.1,
+        cross_fade_duration=0.15,
+        sway_sampling_coef=-1,
+        cfg_strength=2,
+        nfe_step=32,
+        speed=1.0,
+        first_chunk_chars=50,
+        seed=-1,
+    ):
+        if seed == -1:
+            seed = random.randint(0, sys.maxsize)
+        seed_everything(seed)
+        self.seed = seed
+        yield from infer_stream_process(
+            ref_file,
+            ref_text,
+            gen_text,
+            self.ema_model,
+            show_info=show_info,
+            progress=progress,
+            target_rms=target_rms,
+            cross_fade_duration=cross_fade_duration,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            speed=speed,
+            first_chunk_chars=first_chunk_chars,
+            vocoder=self.vocos,
+            device=self.device,
+        )
+
+    # every text for one reference in padded sample calls, returned together once all are vocoded
+    # for callers holding all texts up front, the model worker goes through batch_scheduler() instead
+
+    def infer_many(
+        self,
+        ref_file,
+        ref_text,
+        gen_texts,
+        show_info=print,
+        progress=tqdm,
+        target_rms=0.1,
+        cross_fade_duration=0.15,
+        sway_sampling_coef=-1,
+        cfg_strength=2,
+        nfe_step=32,
+        speed=1.0,
+        fix_duration=None,
+        batch_size=8,
+        remove_silence=False,
+        file_waves=None,
+        file_spects=None,
+        seed=-1,
+    ):
+        if seed == -1:
+            seed = random.randint(0, sys.maxsize)
+        seed_everything(seed)
+        self.seed = seed
+        results = infer_many_process(
+            ref_file,
+            ref_text,
+            gen_texts,
+            self.ema_model,
+            show_info=show_info,
+            progress=progress,
+            target_rms=target_rms,
+            cross_fade_duration=cross_fade_duration,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            speed=speed,
+            fix_duration=fix_duration,
+            batch_size=batch_size,
+            vocoder=self.vocos,
+            device=self.device,
+        )
+
+        if file_waves is not None:
+            for (wav, _, _), file_wave in zip(results, file_waves):
+                self.export_wav(wav, file_wave, remove_silence)
+
+        if file_spects is not None:
+            for (_, _, spect), file_spect in zip(results, file_spects):
+                self.export_spectrogram(spect, file_spect)
+
+        return results
+
+    def batch_scheduler(
+        self,
+        max_batch_frames=16384,
+        max_wait=0.05,
+        target_rms=0.1,
+        sway_sampling_coef=-1,
+        cfg_strength=2,
+        nfe_step=32,
+    ):
+        return BatchScheduler(
+            self.ema_model,
+            max_batch_frames=max_batch_frames,
+            max_wait=max_wait,
+            target_rms=target_rms,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            vocoder=self.vocos,
+            device=self.device,
+        )
+
+    # reuse spans edit() rendered before in the same voice and context, bounded to max_bytes of waves
+
+    def enable_snippet_cache(self, max_bytes=256 * 1024 * 1024):
+        self.snippet_cache = SnippetCache(max_bytes=max_bytes)
+        return self.snippet_cache
+
+    def transcribe_words(self, ref_file):
+        return transcribe_word_timestamps(ref_file, device=self.device)
+
+    def edit(
+        self,
+        ref_file,
+        original_text,
+        new_text,
+        spans=None,
+        word_times=None,
+        fix_duration=None,
+        show_info=print,
+        target_rms=0.1,
+        sway_sampling_coef=-1,
+        cfg_strength=2,
+        nfe_step=32,
+        speed=1.0,
+        remove_silence=False,
+        file_wave=None,
+        file_spect=None,
+        seed=-1,
+    ):
+        chosen_seed = None if seed == -1 else seed  # snippets sampled under a random seed serve any unseeded edit
+        if seed == -1:
+            seed = random.randint(0, sys.maxsize)
+        seed_everything(seed)
+        self.seed = seed
+        if spans is None and word_times is None:  # transcribed here, the words also place the edit windows
+            word_times = self.transcribe_words(ref_file)
+        parts_to_edit = locate_edit_parts(
+            ref_file,
+            original_text,
+            new_text,
+            spans=spans,
+            word_times=word_times,
+            fix_duration=fix_duration,
+            speed=speed,
+            device=self.device,
+        )
+        windows = None
+        if spans is None:
+            windows = edit_windows(word_times, new_text, parts_to_edit, max_duration=self.ema_model.max_duration)
+        contexts = None
+        if self.snippet_cache is not None:
+            old_words = original_text.split() if spans is not None else [str(w[0]) for w in word_times]
+            contexts = edit_contexts(old_words, new_text)
+        wav, sr, spect = edit_process(
+            ref_file,
+            new_text,
+            parts_to_edit,
+            self.ema_model,
+            show_info=show_info,
+            target_rms=target_rms,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            snippet_cache=self.snippet_cache,
+            contexts=contexts,
+            windows=windows,
+            seed=chosen_seed,
+            vocoder=self.vocos,
             device=self.device,
         )
 
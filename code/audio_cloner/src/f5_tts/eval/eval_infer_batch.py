@@ -11,11 +11,10 @@ from importlib.resources import files
 import torch
 import torchaudio
 from accelerate import Accelerator
-from vocos import Vocos
 
 from f5_tts.model import CFM, UNetT, DiT
 from f5_tts.model.utils import get_tokenizer
-from f5_tts.infer.utils_infer import load_checkpoint
+from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder
 from f5_tts.eval.utils_eval import (
     get_seedtts_testset_metainfo,
     get_librispeech_test_clean_metainfo,
@@ -123,14 +122,8 @@ def main():
 
     # Vocoder model
     local = False
-    if local:
-        vocos_local_path = "../checkpoints/charactr/vocos-mel-24khz"
-        vocos = Vocos.from_hparams(f"{vocos_local_path}/config.yaml")
-        state_dict = torch.load(f"{vocos_local_path}/pytorch_model.bin", weights_only=True, map_location=device)
-        vocos.load_state_dict(state_dict)
-        vocos.eval()
-    else:
-        vocos = Vocos.from_pretrained("charactr/vocos-mel-24khz")
+    vocos_local_path = "../checkpoints/charactr/vocos-mel-24khz"
+    vocos = load_vocoder(is_local=local, local_path=vocos_local_path, device=device)
 
     # Tokenizer
     vocab_char_map, vocab_size = get_tokenizer(dataset_name, tokenizer)
@@ -182,7 +175,7 @@ def main():
             for i, gen in enumerate(generated):
                 gen = gen[ref_mel_lens[i] : total_mel_lens[i], :].unsqueeze(0)
                 gen_mel_spec = gen.permute(0, 2, 1)
-                generated_wave = vocos.decode(gen_mel_spec.cpu())
+                generated_wave = vocos.decode(gen_mel_spec).cpu()
                 if ref_rms_list[i] < target_rms:
                     generated_wave = generated_wave * ref_rms_list[i] / target_rms
                 torchaudio.save(f"{output_dir}/{utts[i]}.wav", generated_wave, target_sample_rate)
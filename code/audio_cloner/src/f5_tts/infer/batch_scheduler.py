@@ -0,0 +1,245 @@
+# dynamic batching: concurrent infer requests are coalesced into padded sample calls, grouped by duration bucket
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from f5_tts.infer.utils_infer import cfg_strength
+from f5_tts.infer.utils_infer import chunk_text
+from f5_tts.infer.utils_infer import cross_fade_duration
+from f5_tts.infer.utils_infer import cross_fade_waves
+from f5_tts.infer.utils_infer import estimate_duration
+from f5_tts.infer.utils_infer import fused_cfg
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import nfe_step
+from f5_tts.infer.utils_infer import prepare_ref_audio
+from f5_tts.infer.utils_infer import speed
+from f5_tts.infer.utils_infer import sway_sampling_coef
+from f5_tts.infer.utils_infer import target_rms
+from f5_tts.infer.utils_infer import target_sample_rate
+from f5_tts.infer.utils_infer import vocode_batch
+from f5_tts.model.utils import convert_char_to_pinyin
+
+
+@dataclass
+class ChunkRequest:
+    cond: torch.Tensor  # ref mel, n d
+    ref_audio_len: int
+    duration: int
+    text: list[str]
+    rms: torch.Tensor
+    seed: int | None = None
+    future: Future = field(default_factory=Future)
+    arrival: float = field(default_factory=time.monotonic)
+
+
+class BatchScheduler:
+    def __init__(
+        self,
+        model_obj,
+        max_batch_frames=16384,
+        max_wait=0.05,
+        bucket_frames=256,
+        target_rms=target_rms,
+        nfe_step=nfe_step,
+        cfg_strength=cfg_strength,
+        fused_cfg=fused_cfg,
+        sway_sampling_coef=sway_sampling_coef,
+        vocoder=None,
+        device=None,
+    ):
+        # max_batch_frames bounds the padded cost of one sample call: batch size x longest duration, in mel frames
+        # max_wait is how long (s) the oldest pending chunk may wait for others to share its batch
+        self.model_obj = model_obj
+        self.max_batch_frames = max_batch_frames
+        self.max_wait = max_wait
+        self.bucket_frames = bucket_frames
+        self.target_rms = target_rms
+        self.nfe_step = nfe_step
+        self.cfg_strength = cfg_strength
+        self.fused_cfg = fused_cfg
+        self.sway_sampling_coef = sway_sampling_coef
+        self.vocoder = vocoder
+        self.device = device or model_obj.device
+
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._pending = []
+        self._vocoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="f5tts-vocode")
+        self._thread = threading.Thread(target=self._run, name="f5tts-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._vocoder.shutdown()
+
+    # submit one generation, chunked like infer_process; the future resolves to (wave, sample_rate, spectrogram)
+    # with a seed, the noise of each chunk is drawn from it whatever else shares the batch
+
+    def submit(
+        self,
+        ref_audio,
+        ref_text,
+        gen_text,
+        speed=speed,
+        fix_duration=None,
+        cross_fade_duration=cross_fade_duration,
+        seed=None,
+    ):
+        audio, rms = prepare_ref_audio(ref_audio, target_rms=self.target_rms, device=self.device)
+        ref_seconds = audio.shape[-1] / target_sample_rate
+        max_chars = int(len(ref_text.encode("utf-8")) / ref_seconds * (25 - ref_seconds))
+        gen_text_batches = chunk_text(gen_text, max_chars=max_chars)
+
+        if len(ref_text[-1].encode("utf-8")) == 1:
+            ref_text = ref_text + " "
+        ref_audio_len = audio.shape[-1] // hop_length
+        with torch.inference_mode():
+            cond = self.model_obj.mel_spec(audio).permute(0, 2, 1)[0]
+
+        chunks = []
+        for gen_text in gen_text_batches:
+            duration = estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed, fix_duration=fix_duration)
+            text = convert_char_to_pinyin([ref_text + gen_text])
+            # the duration sample() will actually generate, so the output slice matches a single inference
+            duration = min(max(duration, max(cond.shape[0], len(text[0])) + 1), self.model_obj.max_duration)
+            chunks.append(ChunkRequest(cond, ref_audio_len, duration, text, rms, seed))
+
+        future = Future()
+        remaining = [len(chunks)]
+        lock = threading.Lock()
+
+        def on_chunk_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0 or future.done():
+                    return
+            try:
+                results = [chunk.future.result() for chunk in chunks]
+                final_wave = cross_fade_waves([wave for wave, _, _ in results], cross_fade_duration)
+                future.set_result((final_wave, target_sample_rate, np.concatenate([s for _, _, s in results], axis=1)))
+            except Exception as e:
+                future.set_exception(e)
+
+        for chunk in chunks:
+            chunk.future.add_done_callback(on_chunk_done)
+            self._queue.put(chunk)
+        return future
+
+    def infer(self, ref_audio, ref_text, gen_text, **kwargs):
+        return self.submit(ref_audio, ref_text, gen_text, **kwargs).result()
+
+    # scheduler loop: wait for company up to max_wait, then run the oldest chunk's bucket as one padded batch
+
+    def _bucket(self, chunk):
+        return chunk.duration // self.bucket_frames
+
+    def _run(self):
+        closed = False
+        while not closed or self._pending:
+            if not self._pending:
+                chunk = self._queue.get()
+                if chunk is None:
+                    return
+                self._pending.append(chunk)
+
+            oldest = self._pending[0]
+            while not closed and not self._bucket_full(oldest):
+                timeout = oldest.arrival + self.max_wait - time.monotonic()
+                try:
+                    chunk = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if chunk is None:
+                    closed = True
+                else:
+                    self._pending.append(chunk)
+
+            batch = self._take_batch(oldest)
+            self._sample(batch)
+
+    def _bucket_full(self, oldest):
+        bucket = [chunk for chunk in self._pending if self._bucket(chunk) == self._bucket(oldest)]
+        return len(bucket) * max(chunk.duration for chunk in bucket) >= self.max_batch_frames
+
+    def _take_batch(self, oldest):
+        bucket = sorted(
+            (chunk for chunk in self._pending if self._bucket(chunk) == self._bucket(oldest)),
+            key=lambda chunk: (chunk is not oldest, chunk.arrival),
+        )
+        batch, longest = [], 0
+        for chunk in bucket:
+            longest_with = max(longest, chunk.duration)
+            if batch and (len(batch) + 1) * longest_with > self.max_batch_frames:
+                break
+            batch.append(chunk)
+            longest = longest_with
+        for chunk in batch:
+            self._pending.remove(chunk)
+        return batch
+
+    def _sample(self, batch):
+        try:
+            cond = pad_sequence([chunk.cond for chunk in batch], batch_first=True)
+            lens = torch.tensor([chunk.cond.shape[0] for chunk in batch], dtype=torch.long, device=self.device)
+            duration = torch.tensor([chunk.duration for chunk in batch], dtype=torch.long, device=self.device)
+            text = [chunk.text[0] for chunk in batch]
+
+            # inference, padding of refs and targets is masked out by sample() from lens and duration
+            with torch.inference_mode():
+                generated, _ = self.model_obj.sample(
+                    cond=cond,
+                    text=text,
+                    duration=duration,
+                    lens=lens,
+                    steps=self.nfe_step,
+                    cfg_strength=self.cfg_strength,
+                    sway_sampling_coef=self.sway_sampling_coef,
+                    seed=[chunk.seed for chunk in batch],
+                    fused_cfg=self.fused_cfg,
+                )
+
+            generated = generated.to(torch.float32)
+            generated_mel_specs = [
+                gen[chunk.ref_audio_len : chunk.duration, :].T for chunk, gen in zip(batch, generated)
+            ]
+            # vocoded on its own thread, so the loop can start sampling the next batch
+            self._vocoder.submit(self._vocode, batch, generated_mel_specs)
+        except Exception as e:
+            self._fail(batch, e)
+        self.batches += 1
+        self.requests += len(batch)
+
+    def _vocode(self, batch, generated_mel_specs):
+        try:
+            for chunk, generated_mel_spec, generated_wave in zip(
+                batch, generated_mel_specs, vocode_batch(generated_mel_specs, self.vocoder)
+            ):
+                if chunk.rms < self.target_rms:
+                    generated_wave = generated_wave * chunk.rms / self.target_rms
+                chunk.future.set_result(
+                    (generated_wave.cpu().numpy(), target_sample_rate, generated_mel_spec.cpu().numpy())
+                )
+        except Exception as e:
+            self._fail(batch, e)
+
+    def _fail(self, batch, e):
+        for chunk in batch:
+            if not chunk.future.done():
+                chunk.future.set_exception(e)
@@ -5,7 +5,6 @@ import re
 from pathlib import Path
 from importlib.resources import files
 
-import numpy as np
 import soundfile as sf
 import tomli
 from cached_path import cached_path
@@ -16,6 +15,7 @@ from f5_tts.infer.utils_infer import (
     load_model,
     preprocess_ref_audio_text,
     infer_process,
+    cross_fade_waves,
     remove_silence_for_generated_wav,
 )
 
@@ -168,11 +168,12 @@ def main_process(ref_audio, ref_text, text_gen, model_obj, remove_silence):
         ref_audio = voices[voice]["ref_audio"]
         ref_text = voices[voice]["ref_text"]
         print(f"Voice: {voice}")
-        audio, final_sample_rate, spectragram = infer_process(ref_audio, ref_text, gen_text, model_obj)
+        audio, final_sample_rate, spectragram = infer_process(ref_audio, ref_text, gen_text, model_obj, vocoder=vocos)
         generated_audio_segments.append(audio)
 
     if generated_audio_segments:
-        final_wave = np.concatenate(generated_audio_segments)
+        # voice segments are joined with the same cross-fade as the chunks inside each segment
+        final_wave = cross_fade_waves(generated_audio_segments)
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
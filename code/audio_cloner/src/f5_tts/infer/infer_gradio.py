@@ -29,7 +29,6 @@ def gpu_decorator(func):
 
 from f5_tts.model import DiT, UNetT
 from f5_tts.infer.utils_infer import (
-    load_vocoder,
     load_model,
     preprocess_ref_audio_text,
     infer_process,
@@ -37,9 +36,6 @@ from f5_tts.infer.utils_infer import (
     save_spectrogram,
 )
 
-vocos = load_vocoder()
-
-
 # load models
 F5TTS_model_cfg = dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4)
 F5TTS_ema_model = load_model(
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+from importlib.resources import files
+
+import torch
+from safetensors.torch import save_file
+
+from f5_tts.infer.utils_infer import load_inference_state_dict
+from f5_tts.infer.utils_infer import pack_format
+from f5_tts.infer.utils_infer import read_pack_metadata
+from f5_tts.model.utils import get_tokenizer
+
+
+# convert a training .pt or released .safetensors checkpoint into an inference pack, a .safetensors file holding
+# the final (ema) weights in the pack dtype, with the model config and vocab in its metadata
+# F5TTS(ckpt_file=pack) and load_model() then memory-map the weights and bind them without renaming or casting
+
+model_cfgs = {
+    "F5-TTS": ("DiT", dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4)),
+    "E2-TTS": ("UNetT", dict(dim=1024, depth=24, heads=16, ff_mult=4)),
+}
+
+# float32 packs load with no copy on cpu, bfloat16 and int8 packs trade that for a smaller file and are widened
+# to float32 on load, the model runs in float32 either way
+pack_dtypes = ["float32", "bfloat16", "int8"]
+
+
+# symmetric int8 per output row, dequantized on load as weight * scale
+
+
+def quantize_int8(weight):
+    scale = weight.abs().amax(dim=1, keepdim=True).clamp(min=1e-12) / 127
+    return torch.round(weight / scale).clamp(-127, 127).to(torch.int8), scale
+
+
+def pack_checkpoint(ckpt_path, pack_path, model="F5-TTS", vocab_file="", dtype="float32", use_ema=True):
+    if read_pack_metadata(ckpt_path) is not None:
+        raise ValueError(f"{ckpt_path} is already an inference pack")
+    if dtype not in pack_dtypes:
+        raise ValueError(f"Unknown pack dtype: {dtype}")
+    if vocab_file == "":
+        vocab_file = str(files("f5_tts").joinpath("infer/examples/vocab.txt"))
+    model_cls, model_cfg = model_cfgs[model]
+    vocab_char_map, _ = get_tokenizer(vocab_file, "custom")
+
+    state_dict, _ = load_inference_state_dict(ckpt_path, use_ema=use_ema)
+    tensors, quantized = {}, []
+    for name, tensor in state_dict.items():
+        if not tensor.is_floating_point():
+            tensors[name] = tensor.contiguous()
+        elif dtype == "int8" and tensor.ndim == 2 and name.endswith(".weight"):  # linear and embedding weights
+            tensors[name], tensors[f"{name}.scale"] = quantize_int8(tensor.to(torch.float32))
+            quantized.append(name)
+        else:
+            tensors[name] = tensor.to(torch.float32 if dtype == "int8" else getattr(torch, dtype)).contiguous()
+
+    metadata = {
+        "format": pack_format,
+        "model_cls": model_cls,
+        "model_cfg": json.dumps(model_cfg),
+        "vocab": json.dumps(vocab_char_map, ensure_ascii=False),
+        "dtype": dtype,
+        "quantized": json.dumps(quantized),
+    }
+    save_file(tensors, pack_path, metadata=metadata)
+    return pack_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 pack_cli.py",
+        description="Convert an F5-TTS or E2-TTS checkpoint into an inference pack.",
+    )
+    parser.add_argument("ckpt_file", type=str, help="Training .pt or released .safetensors checkpoint")
+    parser.add_argument("pack_file", type=str, help="Output .safetensors pack")
+    parser.add_argument("-m", "--model", choices=list(model_cfgs), default="F5-TTS", help="Model architecture")
+    parser.add_argument("-v", "--vocab_file", type=str, default="", help="The vocab .txt, the built-in one if empty")
+    parser.add_argument("-d", "--dtype", choices=pack_dtypes, default="float32", help="Dtype of the packed weights")
+    parser.add_argument("--no_ema", action="store_true", help="Pack the raw model weights instead of the ema ones")
+    args = parser.parse_args()
+
+    if not args.pack_file.endswith(".safetensors"):
+        parser.error("pack_file must end with .safetensors")
+    pack_checkpoint(args.ckpt_file, args.pack_file, args.model, args.vocab_file, args.dtype, use_ema=not args.no_ema)
+    print(f"Packed {args.ckpt_file} into {args.pack_file} ({os.path.getsize(args.pack_file) / 1024**2:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
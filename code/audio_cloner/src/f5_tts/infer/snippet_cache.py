@@ -0,0 +1,72 @@
+# per-voice cache of infilled spans: a replacement rendered before in the same voice and context is spliced back in
+# instead of being sampled again, e.g. the same first names across many invites recorded by one speaker
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SnippetCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        # max_bytes bounds the cached waves, least recently used snippets are evicted first
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._snippets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._snippets)
+
+    # voice: the source audio the span is cut from, so renderings never leak across speakers or templates
+
+    @staticmethod
+    def voice_hash(source):
+        return hashlib.sha1(np.ascontiguousarray(source).tobytes()).hexdigest()
+
+    @staticmethod
+    def key(voice, context, start_frame, end_frame, new_frames, **sampling):
+        return (voice, context, start_frame, end_frame, new_frames, tuple(sorted(sampling.items())))
+
+    def get(self, key):
+        with self._lock:
+            wave = self._snippets.get(key)
+            if wave is None:
+                self.misses += 1
+                return None
+            self._snippets.move_to_end(key)
+            self.hits += 1
+            return wave
+
+    def put(self, key, wave):
+        wave = np.array(wave, dtype=np.float32)  # own copy, the caller's buffer may be reused
+        with self._lock:
+            if key in self._snippets:
+                self._bytes -= self._snippets.pop(key).nbytes
+            self._snippets[key] = wave
+            self._bytes += wave.nbytes
+            while self._bytes > self.max_bytes and len(self._snippets) > 1:
+                _, evicted = self._snippets.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._snippets.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "snippets": len(self._snippets),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -3,7 +3,6 @@ import os
 import torch
 import torch.nn.functional as F
 import torchaudio
-from vocos import Vocos
 
 from f5_tts.model import CFM, UNetT, DiT
 from f5_tts.model.utils import (
@@ -12,6 +11,7 @@ from f5_tts.model.utils import (
 )
 from f5_tts.infer.utils_infer import (
     load_checkpoint,
+    load_vocoder,
     save_spectrogram,
 )
 
@@ -89,15 +89,8 @@ if not os.path.exists(output_dir):
 
 # Vocoder model
 local = False
-if local:
-    vocos_local_path = "../checkpoints/charactr/vocos-mel-24khz"
-    vocos = Vocos.from_hparams(f"{vocos_local_path}/config.yaml")
-    state_dict = torch.load(f"{vocos_local_path}/pytorch_model.bin", weights_only=True, map_location=device)
-    vocos.load_state_dict(state_dict)
-
-    vocos.eval()
-else:
-    vocos = Vocos.from_pretrained("charactr/vocos-mel-24khz")
+vocos_local_path = "../checkpoints/charactr/vocos-mel-24khz"
+vocos = load_vocoder(is_local=local, local_path=vocos_local_path, device=device)
 
 # Tokenizer
 vocab_char_map, vocab_size = get_tokenizer(dataset_name, tokenizer)
@@ -182,7 +175,7 @@ print(f"Generated mel: {generated.shape}")
 generated = generated.to(torch.float32)
 generated = generated[:, ref_audio_len:, :]
 generated_mel_spec = generated.permute(0, 2, 1)
-generated_wave = vocos.decode(generated_mel_spec.cpu())
+generated_wave = vocos.decode(generated_mel_spec).cpu()
 if rms < target_rms:
     generated_wave = generated_wave * rms / target_rms
 
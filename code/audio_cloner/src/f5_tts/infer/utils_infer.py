@@ -1,9 +1,15 @@
 # A unified script for inference process
 # Make adjustments inside functions, and consider both gradio and cli scripts if need to change func output format
 
+import difflib
 import hashlib
+import json
+import mmap
 import re
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from importlib.resources import files
 
 import matplotlib
@@ -14,12 +20,12 @@ import matplotlib.pylab as plt
 import numpy as np
 import torch
 import torchaudio
+import torch.nn.functional as F
 import tqdm
 from pydub import AudioSegment, silence
-from transformers import pipeline
 from vocos import Vocos
 
-from f5_tts.model import CFM
+from f5_tts.model import CFM, DiT, MMDiT, UNetT
 from f5_tts.model.utils import (
     get_tokenizer,
     convert_char_to_pinyin,
@@ -29,8 +35,6 @@ _ref_audio_cache = {}
 
 device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
 
-vocos = Vocos.from_pretrained("charactr/vocos-mel-24khz")
-
 
 # -----------------------------------------
 
@@ -42,9 +46,12 @@ cross_fade_duration = 0.15
 ode_method = "euler"
 nfe_step = 32  # 16, 32
 cfg_strength = 2.0
+fused_cfg = True  # cond & null cfg passes as one 2b batched forward per ode step
 sway_sampling_coef = -1.0
 speed = 1.0
 fix_duration = None
+mel_silence = float(np.log(1e-5))  # the floor MelSpec clamps log mels to
+vocoder_margin_frames = 48  # silence after each mel when vocoding, past the receptive field of Vocos (~30 frames)
 
 # -----------------------------------------
 
@@ -82,18 +89,27 @@ def chunk_text(text, max_chars=135):
     return chunks
 
 
-# load vocoder
+# load vocoder, one shared instance per (local path, device) for the whole process, loaded on first use
+# functions taking vocoder=None fall back to the default one, so importing this module loads nothing
+
+_vocoders = {}
+_vocoders_lock = threading.Lock()
+
+
 def load_vocoder(is_local=False, local_path="", device=device):
-    if is_local:
-        print(f"Load vocos from local path {local_path}")
-        vocos = Vocos.from_hparams(f"{local_path}/config.yaml")
-        state_dict = torch.load(f"{local_path}/pytorch_model.bin", map_location=device)
-        vocos.load_state_dict(state_dict)
-        vocos.eval()
-    else:
-        print("Download Vocos from huggingface charactr/vocos-mel-24khz")
-        vocos = Vocos.from_pretrained("charactr/vocos-mel-24khz")
-    return vocos
+    key = (local_path if is_local else None, str(device))
+    with _vocoders_lock:
+        if key not in _vocoders:
+            if is_local:
+                print(f"Load vocos from local path {local_path}")
+                vocos = Vocos.from_hparams(f"{local_path}/config.yaml")
+                state_dict = torch.load(f"{local_path}/pytorch_model.bin", map_location=device)
+                vocos.load_state_dict(state_dict)
+            else:
+                print("Download Vocos from huggingface charactr/vocos-mel-24khz")
+                vocos = Vocos.from_pretrained("charactr/vocos-mel-24khz")
+            _vocoders[key] = vocos.to(device).eval()
+        return _vocoders[key]
 
 
 # load asr pipeline
@@ -104,6 +120,8 @@ asr_pipe = None
 def initialize_asr_pipeline(device: str = device, dtype=None):
     if dtype is None:
         dtype = torch.float32 #added
+    from transformers import pipeline  # only when transcribing, transformers takes seconds to import
+
     global asr_pipe
     asr_pipe = pipeline(
         "automatic-speech-recognition",
@@ -113,37 +131,103 @@ def initialize_asr_pipeline(device: str = device, dtype=None):
     )
 
 
-# load model checkpoint for inference
+# memory-map a .safetensors file, tensors are views of the mapping rather than copies read into ram
+# the mapping is copy-on-write: pages come from the page cache, shared by every process mapping the same file,
+# and a process only gets a private copy of the pages it writes to
+
+safetensors_dtypes = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def read_safetensors_header(f):
+    header_len = int.from_bytes(f.read(8), "little")
+    return header_len, json.loads(f.read(header_len))
+
+
+def mmap_safetensors(path):
+    with open(path, "rb") as f:
+        header_len, header = read_safetensors_header(f)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    metadata = header.pop("__metadata__", None) or {}
+
+    data_start = 8 + header_len
+    tensors = {}
+    for name, info in header.items():
+        dtype = safetensors_dtypes[info["dtype"]]
+        begin, end = info["data_offsets"]
+        if begin == end:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+        else:
+            count = (end - begin) // dtype.itemsize
+            tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+            tensors[name] = tensor.view(info["shape"])
+    return tensors, metadata
 
 
-def load_checkpoint(model, ckpt_path, device: str, dtype=None, use_ema=True):
-    if dtype is None:
-        dtype = torch.float32 # added
-    
-    if device == "cuda":
-        model = model.half()
+# inference pack (see pack_cli.py): the final weights of one model, with its config and vocab, ready to bind as is
+
+pack_format = "f5-tts-pack/1"
+pack_backbones = {"DiT": DiT, "UNetT": UNetT, "MMDiT": MMDiT}
+
+
+def read_pack_metadata(ckpt_path):
+    # reads the header only, None if the checkpoint is not a pack
+    if not ckpt_path.endswith(".safetensors"):
+        return None
+    with open(ckpt_path, "rb") as f:
+        _, header = read_safetensors_header(f)
+    metadata = header.get("__metadata__") or {}
+    return metadata if metadata.get("format") == pack_format else None
+
+
+# state dict of the weights inference uses, memory-mapped, and the pack metadata if the checkpoint is a pack
 
+
+def load_inference_state_dict(ckpt_path, use_ema=True):
     ckpt_type = ckpt_path.split(".")[-1]
     if ckpt_type == "safetensors":
-        from safetensors.torch import load_file
-
-        checkpoint = load_file(ckpt_path)
+        checkpoint, metadata = mmap_safetensors(ckpt_path)
+        if metadata.get("format") == pack_format:
+            # int8 weights are stored per row with their scale, dequantized here
+            for name in json.loads(metadata["quantized"]):
+                checkpoint[name] = checkpoint[name].to(torch.float32) * checkpoint.pop(f"{name}.scale")
+            return checkpoint, metadata
+        checkpoint = {"ema_model_state_dict" if use_ema else "model_state_dict": checkpoint}
     else:
-        checkpoint = torch.load(ckpt_path, weights_only=True)
+        checkpoint = torch.load(ckpt_path, map_location="cpu", weights_only=True, mmap=True)
 
     if use_ema:
-        if ckpt_type == "safetensors":
-            checkpoint = {"ema_model_state_dict": checkpoint}
-        checkpoint["model_state_dict"] = {
+        state_dict = {
             k.replace("ema_model.", ""): v
             for k, v in checkpoint["ema_model_state_dict"].items()
             if k not in ["initted", "step"]
         }
-        model.load_state_dict(checkpoint["model_state_dict"])
     else:
-        if ckpt_type == "safetensors":
-            checkpoint = {"model_state_dict": checkpoint}
-        model.load_state_dict(checkpoint["model_state_dict"])
+        state_dict = checkpoint["model_state_dict"]
+    return state_dict, None
+
+
+# load model checkpoint for inference
+
+
+def load_checkpoint(model, ckpt_path, device: str, dtype=None, use_ema=True):
+    if dtype is None:
+        dtype = torch.float32 # added
+
+    # weights stay memory-mapped: on cpu the model's parameters are bound to the mapped tensors (no copy if the
+    # checkpoint already has the target dtype), on a gpu they are copied once from the mapping to the device
+    state_dict, _ = load_inference_state_dict(ckpt_path, use_ema=use_ema)
+    model.load_state_dict(state_dict, assign=torch.device(device).type == "cpu")
 
     return model.to(dtype)
 
@@ -152,15 +236,22 @@ def load_checkpoint(model, ckpt_path, device: str, dtype=None, use_ema=True):
 
 
 def load_model(model_cls, model_cfg, ckpt_path, vocab_file="", ode_method=ode_method, use_ema=True, device=device):
-    if vocab_file == "":
-        vocab_file = str(files("f5_tts").joinpath("infer/examples/vocab.txt"))
-    tokenizer = "custom"
+    pack = read_pack_metadata(ckpt_path)
+    if pack is not None:  # a pack brings its own model config and vocab
+        model_cls = pack_backbones[pack["model_cls"]]
+        model_cfg = json.loads(pack["model_cfg"])
+        vocab_char_map = json.loads(pack["vocab"])
+        vocab_size = len(vocab_char_map)
+    else:
+        if vocab_file == "":
+            vocab_file = str(files("f5_tts").joinpath("infer/examples/vocab.txt"))
+        tokenizer = "custom"
 
-    print("\nvocab : ", vocab_file)
-    print("tokenizer : ", tokenizer)
-    print("model : ", ckpt_path, "\n")
+        print("\nvocab : ", vocab_file)
+        print("tokenizer : ", tokenizer)
+        print("model : ", ckpt_path, "\n")
 
-    vocab_char_map, vocab_size = get_tokenizer(vocab_file, tokenizer)
+        vocab_char_map, vocab_size = get_tokenizer(vocab_file, tokenizer)
     model = CFM(
         transformer=model_cls(**model_cfg, text_num_embeds=vocab_size, mel_dim=n_mel_channels),
         mel_spec_kwargs=dict(
@@ -238,6 +329,171 @@ def preprocess_ref_audio_text(ref_audio_orig, ref_text, show_info=print, device=
     return ref_audio, ref_text
 
 
+# reference audio from a file, or an in-memory (samples, sample_rate) pair as decoded by the caller
+
+
+def load_ref_audio(ref_audio):
+    if isinstance(ref_audio, (tuple, list)):
+        audio, sr = ref_audio
+        audio = torch.as_tensor(audio, dtype=torch.float32)
+        if audio.ndim == 1:
+            audio = audio.unsqueeze(0)
+        return audio, sr
+    return torchaudio.load(ref_audio)
+
+
+# mono, loudness-normalized, resampled reference audio on device
+
+
+def prepare_ref_audio(ref_audio, target_rms=target_rms, device=device):
+    audio, sr = ref_audio
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+
+    rms = torch.sqrt(torch.mean(torch.square(audio)))
+    if rms < target_rms:
+        audio = audio * target_rms / rms
+    if sr != target_sample_rate:
+        resampler = torchaudio.transforms.Resample(sr, target_sample_rate)
+        audio = resampler(audio)
+    audio = audio.to(device)
+
+    return audio, rms
+
+
+# combine generated waves with cross-fading
+
+
+@lru_cache(maxsize=16)
+def fade_windows(cross_fade_samples):
+    fade_in = np.linspace(0, 1, cross_fade_samples, dtype=np.float32)
+    fade_in.setflags(write=False)
+    return fade_in[::-1], fade_in
+
+
+def cross_fade_waves(generated_waves, cross_fade_duration=cross_fade_duration):
+    # each overlap is capped by the output so far and the next wave, so the final length is known up front
+    cross_fade_samples = max(int(cross_fade_duration * target_sample_rate), 0)
+    overlaps, total = [], 0
+    for i, wave in enumerate(generated_waves):
+        overlaps.append(min(cross_fade_samples, total, len(wave)) if i > 0 else 0)
+        total += len(wave) - overlaps[-1]
+
+    # write every wave into one float32 buffer, fading into the tail of what is already there
+    final_wave = np.empty(total, dtype=np.float32)
+    position = 0
+    for wave, overlap in zip(generated_waves, overlaps):
+        if overlap > 0:
+            fade_out, fade_in = fade_windows(overlap)
+            final_wave[position - overlap : position] *= fade_out
+            final_wave[position - overlap : position] += wave[:overlap] * fade_in
+        final_wave[position : position + len(wave) - overlap] = wave[overlap:]
+        position += len(wave) - overlap
+
+    return final_wave
+
+
+# cross-fade waves as they arrive, yielding the output up to the part the next wave may still fade into
+# the concatenated blocks equal cross_fade_waves() of all waves
+
+
+def cross_fade_stream(generated_waves, cross_fade_duration=cross_fade_duration):
+    cross_fade_samples = max(int(cross_fade_duration * target_sample_rate), 0)
+    pending, total = None, 0
+    for next_wave in generated_waves:
+        if pending is None:
+            pending, total = next_wave, len(next_wave)
+        else:
+            overlap = min(cross_fade_samples, total, len(next_wave))
+            if overlap > 0:
+                fade_out, fade_in = fade_windows(overlap)
+                cross_faded_overlap = pending[-overlap:] * fade_out + next_wave[:overlap] * fade_in
+                pending = np.concatenate([pending[:-overlap], cross_faded_overlap, next_wave[overlap:]])
+            else:
+                pending = np.concatenate([pending, next_wave])
+            total += len(next_wave) - overlap
+
+        if len(pending) > cross_fade_samples:
+            yield pending[: len(pending) - cross_fade_samples]
+            pending = pending[len(pending) - cross_fade_samples :]
+    if pending is not None and len(pending) > 0:
+        yield pending
+
+
+# vocode mels of different lengths ([d, n] each) in one call
+# each mel is followed by vocoder_margin_frames of silence, then padded with silence to the longest, so an item's
+# tail only ever sees its own silence margin and comes out the same whatever else is in the batch
+
+
+def vocode_batch(mel_specs, vocoder=None):
+    if vocoder is None:
+        vocoder = load_vocoder()
+    lengths = [mel_spec.shape[-1] for mel_spec in mel_specs]
+    padded = torch.cat(
+        [
+            F.pad(mel_spec.unsqueeze(0), (0, max(lengths) - length + vocoder_margin_frames), value=mel_silence)
+            for mel_spec, length in zip(mel_specs, lengths)
+        ]
+    )
+    waves = vocoder.decode(padded.to(next(vocoder.parameters()).device))
+    return [wave[: length * hop_length] for wave, length in zip(waves, lengths)]
+
+
+# frames to generate for a chunk: the reference plus the chunk at the reference's speaking rate
+
+
+def estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed, fix_duration=None):
+    if fix_duration is not None:
+        return int(fix_duration * target_sample_rate / hop_length)
+    ref_text_len = len(ref_text.encode("utf-8"))
+    gen_text_len = len(gen_text.encode("utf-8"))
+    return ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / speed)
+
+
+# one padded sample call for texts sharing the reference, returns each generated mel [d, n] without the reference
+
+
+def sample_batch(
+    model_obj,
+    audio,
+    text_list,
+    durations,
+    nfe_step=nfe_step,
+    cfg_strength=cfg_strength,
+    fused_cfg=fused_cfg,
+    sway_sampling_coef=sway_sampling_coef,
+    device=device,
+):
+    ref_audio_len = audio.shape[-1] // hop_length
+    final_text_list = convert_char_to_pinyin(text_list)
+    duration = torch.tensor(durations, dtype=torch.long, device=device)
+
+    # inference, padding is masked out by sample() from the per-item durations
+    with torch.inference_mode():
+        generated, _ = model_obj.sample(
+            cond=audio.repeat(len(text_list), 1),
+            text=final_text_list,
+            duration=duration,
+            steps=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            fused_cfg=fused_cfg,
+        )
+
+    generated = generated.to(torch.float32)
+    return [gen[ref_audio_len:item_duration, :].T for item_duration, gen in zip(durations, generated)]
+
+
+# vocode a batch and undo the reference loudness normalization, numpy waves
+
+
+def vocode_waves(mel_specs, rms, target_rms=target_rms, vocoder=None):
+    waves = vocode_batch(mel_specs, vocoder)
+    if rms < target_rms:
+        waves = [wave * rms / target_rms for wave in waves]
+    return [wave.cpu().numpy() for wave in waves]
+
+
 # infer process: chunk text -> infer batches [i.e. infer_batch_process()]
 
 
@@ -252,13 +508,15 @@ def infer_process(
     cross_fade_duration=cross_fade_duration,
     nfe_step=nfe_step,
     cfg_strength=cfg_strength,
+    fused_cfg=fused_cfg,
     sway_sampling_coef=sway_sampling_coef,
     speed=speed,
     fix_duration=fix_duration,
+    vocoder=None,
     device=device,
 ):
     # Split the input text into batches
-    audio, sr = torchaudio.load(ref_audio)
+    audio, sr = load_ref_audio(ref_audio)
     max_chars = int(len(ref_text.encode("utf-8")) / (audio.shape[-1] / sr) * (25 - audio.shape[-1] / sr))
     gen_text_batches = chunk_text(gen_text, max_chars=max_chars)
     for i, gen_text in enumerate(gen_text_batches):
@@ -275,9 +533,11 @@ def infer_process(
         cross_fade_duration=cross_fade_duration,
         nfe_step=nfe_step,
         cfg_strength=cfg_strength,
+        fused_cfg=fused_cfg,
         sway_sampling_coef=sway_sampling_coef,
         speed=speed,
         fix_duration=fix_duration,
+        vocoder=vocoder,
         device=device,
     )
 
@@ -295,107 +555,557 @@ def infer_batch_process(
     cross_fade_duration=0.15,
     nfe_step=32,
     cfg_strength=2.0,
+    fused_cfg=True,
     sway_sampling_coef=-1,
     speed=1,
     fix_duration=None,
+    vocoder=None,
     device=None,
 ):
-    audio, sr = ref_audio
-    if audio.shape[0] > 1:
-        audio = torch.mean(audio, dim=0, keepdim=True)
+    # all chunks share the reference, so they go through one padded sample call and one vocoder call
+    (result,) = infer_many_batch_process(
+        ref_audio,
+        ref_text,
+        [gen_text_batches],
+        model_obj,
+        progress=progress,
+        target_rms=target_rms,
+        cross_fade_duration=cross_fade_duration,
+        nfe_step=nfe_step,
+        cfg_strength=cfg_strength,
+        fused_cfg=fused_cfg,
+        sway_sampling_coef=sway_sampling_coef,
+        speed=speed,
+        fix_duration=fix_duration,
+        batch_size=len(gen_text_batches),
+        vocoder=vocoder,
+        device=device,
+    )
+    return result
 
-    rms = torch.sqrt(torch.mean(torch.square(audio)))
-    if rms < target_rms:
-        audio = audio * target_rms / rms
-    if sr != target_sample_rate:
-        resampler = torchaudio.transforms.Resample(sr, target_sample_rate)
-        audio = resampler(audio)
-    audio = audio.to(device)
 
-    generated_waves = []
-    spectrograms = []
+# infer stream: a short first chunk for a quick start, then chunks of the usual size generated one after another
+# yields cross-faded blocks of the wave as soon as each chunk is vocoded
+
 
+def infer_stream_process(
+    ref_audio,
+    ref_text,
+    gen_text,
+    model_obj,
+    show_info=print,
+    progress=tqdm,
+    target_rms=target_rms,
+    cross_fade_duration=cross_fade_duration,
+    nfe_step=nfe_step,
+    cfg_strength=cfg_strength,
+    fused_cfg=fused_cfg,
+    sway_sampling_coef=sway_sampling_coef,
+    speed=speed,
+    first_chunk_chars=50,
+    vocoder=None,
+    device=device,
+):
+    if not gen_text.strip():
+        raise ValueError("Nothing to stream, gen_text is empty.")
+    audio, sr = load_ref_audio(ref_audio)
+    max_chars = int(len(ref_text.encode("utf-8")) / (audio.shape[-1] / sr) * (25 - audio.shape[-1] / sr))
+    # whole sentences: the first as short as first_chunk_chars allows, the rest re-chunked to max_chars
+    first_chunk, *rest = chunk_text(gen_text, max_chars=min(first_chunk_chars, max_chars))
+    gen_text_batches = [first_chunk] + (chunk_text(" ".join(rest), max_chars=max_chars) if rest else [])
+
+    show_info(f"Streaming audio in {len(gen_text_batches)} batches...")
+    audio, rms = prepare_ref_audio((audio, sr), target_rms=target_rms, device=device)
     if len(ref_text[-1].encode("utf-8")) == 1:
         ref_text = ref_text + " "
-    for i, gen_text in enumerate(progress.tqdm(gen_text_batches)):
-        # Prepare the text
-        text_list = [ref_text + gen_text]
-        final_text_list = convert_char_to_pinyin(text_list)
+    ref_audio_len = audio.shape[-1] // hop_length
+
+    # chunks are sampled back to back on a background thread, each is vocoded here while the next one is sampled
+    sampler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="f5tts-sample")
+    sampled = [
+        sampler.submit(
+            sample_batch,
+            model_obj,
+            audio,
+            [ref_text + gen_text],
+            [estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed)],
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            fused_cfg=fused_cfg,
+            sway_sampling_coef=sway_sampling_coef,
+            device=device,
+        )
+        for gen_text in gen_text_batches
+    ]
+
+    def generated_waves():
+        for future in progress.tqdm(sampled):
+            yield vocode_waves(future.result(), rms, target_rms, vocoder)[0]
+
+    try:
+        for block in cross_fade_stream(generated_waves(), cross_fade_duration):
+            yield block, target_sample_rate
+    finally:  # stopped early: drop the chunks not sampled yet
+        for future in sampled:
+            future.cancel()
+        sampler.shutdown(wait=False)
+
+
+# infer many: variants sharing one reference -> padded batches [i.e. infer_many_batch_process()]
+
+
+def infer_many_process(
+    ref_audio,
+    ref_text,
+    gen_texts,
+    model_obj,
+    show_info=print,
+    progress=tqdm,
+    target_rms=target_rms,
+    cross_fade_duration=cross_fade_duration,
+    nfe_step=nfe_step,
+    cfg_strength=cfg_strength,
+    fused_cfg=fused_cfg,
+    sway_sampling_coef=sway_sampling_coef,
+    speed=speed,
+    fix_duration=fix_duration,
+    batch_size=8,
+    vocoder=None,
+    device=device,
+):
+    # Split every variant into batches with the same budget infer_process uses
+    audio, sr = load_ref_audio(ref_audio)
+    max_chars = int(len(ref_text.encode("utf-8")) / (audio.shape[-1] / sr) * (25 - audio.shape[-1] / sr))
+    gen_text_batches = [chunk_text(gen_text, max_chars=max_chars) for gen_text in gen_texts]
 
-        ref_audio_len = audio.shape[-1] // hop_length
-        if fix_duration is not None:
-            duration = int(fix_duration * target_sample_rate / hop_length)
-        else:
-            # Calculate duration
-            ref_text_len = len(ref_text.encode("utf-8"))
-            gen_text_len = len(gen_text.encode("utf-8"))
-            duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / speed)
+    show_info(f"Generating audio for {len(gen_texts)} variants, up to {batch_size} per sample call...")
+    return infer_many_batch_process(
+        (audio, sr),
+        ref_text,
+        gen_text_batches,
+        model_obj,
+        progress=progress,
+        target_rms=target_rms,
+        cross_fade_duration=cross_fade_duration,
+        nfe_step=nfe_step,
+        cfg_strength=cfg_strength,
+        fused_cfg=fused_cfg,
+        sway_sampling_coef=sway_sampling_coef,
+        speed=speed,
+        fix_duration=fix_duration,
+        batch_size=batch_size,
+        vocoder=vocoder,
+        device=device,
+    )
 
-        # inference
-        with torch.inference_mode():
-            generated, _ = model_obj.sample(
-                cond=audio,
-                text=final_text_list,
-                duration=duration,
-                steps=nfe_step,
+
+# infer many batches: every (variant, chunk) pair shares the reference, so they are padded into one sample call
+
+
+def infer_many_batch_process(
+    ref_audio,
+    ref_text,
+    gen_text_batches,
+    model_obj,
+    progress=tqdm,
+    target_rms=0.1,
+    cross_fade_duration=0.15,
+    nfe_step=32,
+    cfg_strength=2.0,
+    fused_cfg=True,
+    sway_sampling_coef=-1,
+    speed=1,
+    fix_duration=None,
+    batch_size=8,
+    vocoder=None,
+    device=None,
+):
+    audio, rms = prepare_ref_audio(ref_audio, target_rms=target_rms, device=device)
+
+    if len(ref_text[-1].encode("utf-8")) == 1:
+        ref_text = ref_text + " "
+    ref_audio_len = audio.shape[-1] // hop_length
+
+    # Flatten to (duration, variant, chunk, text) and sort by duration, so each padded batch wastes few frames
+    items = []
+    for variant_idx, variant_texts in enumerate(gen_text_batches):
+        for chunk_idx, gen_text in enumerate(variant_texts):
+            duration = estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed, fix_duration=fix_duration)
+            items.append((duration, variant_idx, chunk_idx, gen_text))
+    items.sort(key=lambda item: item[0])
+
+    generated_waves = [[None] * len(variant_texts) for variant_texts in gen_text_batches]
+    spectrograms = [[None] * len(variant_texts) for variant_texts in gen_text_batches]
+
+    # each batch is vocoded on a background thread while the next one is sampled, then reassembled in order
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    vocoded = []
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="f5tts-vocode") as vocode_pool:
+        for batch in progress.tqdm(batches):
+            generated_mel_specs = sample_batch(
+                model_obj,
+                audio,
+                [ref_text + gen_text for _, _, _, gen_text in batch],
+                [item[0] for item in batch],
+                nfe_step=nfe_step,
                 cfg_strength=cfg_strength,
+                fused_cfg=fused_cfg,
                 sway_sampling_coef=sway_sampling_coef,
+                device=device,
+            )
+            vocoded.append(
+                (
+                    batch,
+                    generated_mel_specs,
+                    vocode_pool.submit(vocode_waves, generated_mel_specs, rms, target_rms, vocoder),
+                )
             )
 
-        generated = generated.to(torch.float32)
-        generated = generated[:, ref_audio_len:, :]
-        generated_mel_spec = generated.permute(0, 2, 1)
-        generated_wave = vocos.decode(generated_mel_spec.cpu())
-        if rms < target_rms:
-            generated_wave = generated_wave * rms / target_rms
+        for batch, generated_mel_specs, batch_waves in vocoded:
+            for (_, variant_idx, chunk_idx, _), generated_mel_spec, generated_wave in zip(
+                batch, generated_mel_specs, batch_waves.result()
+            ):
+                generated_waves[variant_idx][chunk_idx] = generated_wave
+                spectrograms[variant_idx][chunk_idx] = generated_mel_spec.cpu().numpy()
+
+    return [
+        (
+            cross_fade_waves(variant_waves, cross_fade_duration),
+            target_sample_rate,
+            np.concatenate(variant_spectrograms, axis=1),
+        )
+        for variant_waves, variant_spectrograms in zip(generated_waves, spectrograms)
+    ]
+
+
+# word-level timestamps of reference audio, to locate the spans to edit
+
+
+def transcribe_word_timestamps(ref_audio, device=device):
+    global asr_pipe
+    if asr_pipe is None:
+        initialize_asr_pipeline(device=device)
+    if isinstance(ref_audio, (tuple, list)):
+        audio, sr = load_ref_audio(ref_audio)
+        ref_audio = {"raw": audio.mean(dim=0).numpy(), "sampling_rate": sr}
+    chunks = asr_pipe(
+        ref_audio,
+        chunk_length_s=30,
+        batch_size=128,
+        generate_kwargs={"task": "transcribe"},
+        return_timestamps="word",
+    )["chunks"]
+
+    word_times = []
+    for chunk in chunks:
+        start, end = chunk["timestamp"]
+        word_times.append((chunk["text"].strip(), start, end if end is not None else start))
+    return word_times
+
+
+# runs of changed words between two word lists: (i1, i2) into old_words, and the new words replacing them
+
+
+def normalize_word(word):
+    return re.sub(r"[^\w]", "", word).lower()
+
+
+def diff_word_runs(old_words, new_words):
+    matcher = difflib.SequenceMatcher(
+        a=[normalize_word(w) for w in old_words], b=[normalize_word(w) for w in new_words], autojunk=False
+    )
+    return [(i1, i2, new_words[j1:j2]) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+# context of each changed run, the same runs as locate_edit_parts: (word before, new words, word after), normalized
+
 
-        # wav -> numpy
-        generated_wave = generated_wave.squeeze().cpu().numpy()
+def edit_contexts(old_words, gen_text):
+    contexts = []
+    for i1, i2, new_run in diff_word_runs(old_words, gen_text.split()):
+        before = normalize_word(old_words[i1 - 1]) if i1 > 0 else ""
+        after = normalize_word(old_words[i2]) if i2 < len(old_words) else ""
+        contexts.append((before, " ".join(normalize_word(w) for w in new_run), after))
+    return contexts
 
-        generated_waves.append(generated_wave)
-        spectrograms.append(generated_mel_spec[0].cpu().numpy())
 
-    # Combine all generated waves with cross-fading
-    if cross_fade_duration <= 0:
-        # Simply concatenate
-        final_wave = np.concatenate(generated_waves)
+# parts to edit: (start, end, new_duration) in seconds of ref_audio, one per run of changed words
+
+
+def locate_edit_parts(
+    ref_audio,
+    ref_text,
+    gen_text,
+    spans=None,
+    word_times=None,
+    fix_duration=None,
+    speed=speed,
+    device=device,
+):
+    # spans given: one [start, end] per changed run between ref_text and gen_text, like speech_edit.py parts_to_edit
+    # otherwise the runs are found on timed words, rows of (word, start, end, ...), transcribed here if not passed in
+    if spans is None:
+        if word_times is None:
+            word_times = transcribe_word_timestamps(ref_audio, device=device)
+        old_words = [str(timed_word[0]) for timed_word in word_times]
     else:
-        final_wave = generated_waves[0]
-        for i in range(1, len(generated_waves)):
-            prev_wave = final_wave
-            next_wave = generated_waves[i]
-
-            # Calculate cross-fade samples, ensuring it does not exceed wave lengths
-            cross_fade_samples = int(cross_fade_duration * target_sample_rate)
-            cross_fade_samples = min(cross_fade_samples, len(prev_wave), len(next_wave))
-
-            if cross_fade_samples <= 0:
-                # No overlap possible, concatenate
-                final_wave = np.concatenate([prev_wave, next_wave])
-                continue
+        old_words = ref_text.split()
+    runs = diff_word_runs(old_words, gen_text.split())
+
+    if spans is None:
+        spans = []
+        for i1, i2, _ in runs:
+            if i1 < i2:  # replaced or deleted words
+                spans.append((word_times[i1][1], word_times[i2 - 1][2]))
+            else:  # inserted words take over the gap before the next word
+                start = word_times[i1 - 1][2] if i1 > 0 else 0.0
+                end = word_times[i1][1] if i1 < len(word_times) else start
+                spans.append((start, max(start, end)))
+    if len(spans) != len(runs):
+        raise ValueError(f"Got {len(spans)} spans for {len(runs)} changed runs of words.")
+
+    if isinstance(ref_audio, (tuple, list)):
+        ref_duration = np.shape(ref_audio[0])[-1] / ref_audio[1]
+    else:
+        info = torchaudio.info(ref_audio)
+        ref_duration = info.num_frames / info.sample_rate
+    seconds_per_byte = ref_duration / max(len(ref_text.encode("utf-8")), 1)
+
+    parts_to_edit = []
+    for i, ((start, end), (i1, i2, new_run)) in enumerate(zip(spans, runs)):
+        old_len = len(" ".join(old_words[i1:i2]).encode("utf-8"))
+        new_len = len(" ".join(new_run).encode("utf-8"))
+        if fix_duration is not None:
+            new_duration = fix_duration[i]
+        elif old_len > 0 and end > start:  # keep the speaking rate of the replaced words
+            new_duration = (end - start) * new_len / old_len / speed
+        else:
+            new_duration = seconds_per_byte * new_len / speed
+        parts_to_edit.append((start, end, new_duration))
 
-            # Overlapping parts
-            prev_overlap = prev_wave[-cross_fade_samples:]
-            next_overlap = next_wave[:cross_fade_samples]
+    return parts_to_edit
 
-            # Fade out and fade in
-            fade_out = np.linspace(1, 0, cross_fade_samples)
-            fade_in = np.linspace(0, 1, cross_fade_samples)
 
-            # Cross-faded overlap
-            cross_faded_overlap = prev_overlap * fade_out + next_overlap * fade_in
+# edit windows: each run of changed words is infilled with up to context seconds of kept words on both sides and its
+# slice of gen_text, rather than the whole clip, so long clips stay under the model's max_duration
+# runs whose windows would overlap share one window; windows: (start, end, text, part indices), seconds of ref_audio
 
-            # Combine
-            new_wave = np.concatenate(
-                [prev_wave[:-cross_fade_samples], cross_faded_overlap, next_wave[cross_fade_samples:]]
-            )
 
-            final_wave = new_wave
+def edit_windows(word_times, gen_text, parts_to_edit, context=4.0, max_duration=4096):
+    if not word_times:  # nothing to place windows on, the whole clip is one window
+        return None
+    old_words = [str(timed_word[0]) for timed_word in word_times]
+    new_words = gen_text.split()
+    runs = diff_word_runs(old_words, new_words)
+    if len(runs) != len(parts_to_edit):
+        raise ValueError(f"Got {len(parts_to_edit)} parts for {len(runs)} changed runs of words.")
+    max_seconds = (max_duration - 1) * hop_length / target_sample_rate
+
+    def new_length(indices, start, end):  # seconds of [start, end] once the parts in it are replaced
+        return end - start + sum(parts_to_edit[i][2] - (parts_to_edit[i][1] - parts_to_edit[i][0]) for i in indices)
+
+    def bounds(left, right, start, end):  # window from the gap before word left to the gap before word right
+        window_start = 0.0 if left == 0 else (word_times[left - 1][2] + word_times[left][1]) / 2
+        if right == len(word_times):
+            window_end = word_times[-1][2]
+        else:
+            window_end = (word_times[right - 1][2] + word_times[right][1]) / 2 if right > 0 else word_times[0][1]
+        return min(window_start, start), max(window_end, end)
+
+    groups = []
+    for i, (start, end, _) in enumerate(parts_to_edit):
+        if groups:
+            first, last = groups[-1][0], groups[-1][-1]
+            near = start - parts_to_edit[last][1] < 2 * context
+            if near and new_length(groups[-1] + [i], parts_to_edit[first][0], end) + 2 * context <= max_seconds:
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+
+    windows, lower = [], 0
+    for g, group in enumerate(groups):
+        a, b = group[0], group[-1]
+        (i1, _, _), (_, i2, _) = runs[a], runs[b]
+        upper = runs[groups[g + 1][0]][0] if g + 1 < len(groups) else len(old_words)
+        start, end = parts_to_edit[a][0], parts_to_edit[b][1]
+
+        # widen to whole kept words within context, then narrow again while the window is too long
+        left = i1
+        while left > lower and word_times[left - 1][1] >= start - context:
+            left -= 1
+        right = i2
+        while right < upper and word_times[right][2] <= end + context:
+            right += 1
+
+        window = bounds(left, right, start, end)
+        while new_length(group, *window) > max_seconds and (left < i1 or right > i2):
+            if left < i1 and (right == i2 or start - window[0] >= window[1] - end):
+                left += 1
+            else:
+                right -= 1
+            window = bounds(left, right, start, end)
+        if new_length(group, *window) > max_seconds:
+            raise ValueError(f"Edit at {start:.1f}s is longer than the {max_seconds:.1f}s the model can generate.")
+
+        before = sum(len(new_run) - (run_i2 - run_i1) for run_i1, run_i2, new_run in runs[:a])
+        through = sum(len(new_run) - (run_i2 - run_i1) for run_i1, run_i2, new_run in runs[: b + 1])
+        windows.append((*window, " ".join(new_words[left + before : right + through]), group))
+        lower = right
+    return windows
+
+
+# edit process: infill only the parts to edit, keep everything else of ref_audio
+
+
+def edit_process(
+    ref_audio,
+    gen_text,
+    parts_to_edit,
+    model_obj,
+    show_info=print,
+    target_rms=target_rms,
+    nfe_step=nfe_step,
+    cfg_strength=cfg_strength,
+    fused_cfg=fused_cfg,
+    sway_sampling_coef=sway_sampling_coef,
+    snippet_cache=None,
+    contexts=None,
+    windows=None,
+    seed=None,
+    vocoder=None,
+    device=device,
+):
+    # windows (see edit_windows): each is infilled in its own sample call, without them the whole clip and gen_text
+    # are one window, which has to fit in the model's max_duration
+    # snippet_cache with contexts (one per part, see edit_contexts): parts rendered before in this voice and context
+    # are laid into cond as known audio rather than infilled, and newly infilled parts are added to the cache
+    # seed: the one sampling was seeded with if the caller chose it, so a seeded edit only reuses snippets of that seed
+    audio, sr = load_ref_audio(ref_audio)
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+    if sr != target_sample_rate:
+        resampler = torchaudio.transforms.Resample(sr, target_sample_rate)
+        audio = resampler(audio)
+    source = audio.squeeze(0).numpy()  # untouched regions are copied verbatim from here
+
+    rms = torch.sqrt(torch.mean(torch.square(audio)))
+    gain = target_rms / rms if rms < target_rms else 1.0
+    audio = audio * gain
+
+    use_snippets = snippet_cache is not None and contexts is not None
+    if use_snippets:
+        voice = snippet_cache.voice_hash(source)
+
+    # parts on the hop grid, so every mel frame maps to exact samples: (start frame, end frame, new frames)
+    frame_parts, offset, max_frame = [], 0, audio.shape[-1] // hop_length
+    for start, end, new_duration in parts_to_edit:
+        start_frame = min(max(round(start * target_sample_rate / hop_length), offset), max_frame)
+        end_frame = min(max(round(end * target_sample_rate / hop_length), start_frame), max_frame)
+        frame_parts.append((start_frame, end_frame, round(new_duration * target_sample_rate / hop_length)))
+        offset = end_frame
+
+    # part waves: a cached snippet, or infilled below
+    part_waves, snippet_keys = [None] * len(frame_parts), [None] * len(frame_parts)
+    for i, (start_frame, end_frame, new_frames) in enumerate(frame_parts):
+        if use_snippets:
+            snippet_keys[i] = snippet_cache.key(
+                voice,
+                contexts[i],
+                start_frame,
+                end_frame,
+                new_frames,
+                nfe_step=nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                seed=seed,
+            )
+            part_waves[i] = snippet_cache.get(snippet_keys[i])
+
+    if windows is None:
+        windows = []
+        if frame_parts:
+            windows = [(0.0, max_frame * hop_length / target_sample_rate, gen_text, list(range(len(frame_parts))))]
+    infills, window_offset = [], 0
+    for window_start, window_end, window_text, indices in windows:
+        if not indices:
+            continue
+        first, last = frame_parts[indices[0]], frame_parts[indices[-1]]
+        window_start = max(min(round(window_start * target_sample_rate / hop_length), first[0]), window_offset)
+        window_end = max(min(round(window_end * target_sample_rate / hop_length), max_frame), last[1])
+        window_offset = window_end
+        if any(part_waves[i] is None for i in indices):
+            infills.append((window_start, window_end, window_text, indices))
+    if not frame_parts:
+        show_info("Nothing to edit, returning the source audio...")
+    elif not infills:
+        show_info(f"All {len(frame_parts)} spans found in the snippet cache, skipping inference...")
+
+    for window_start, window_end, window_text, indices in infills:
+        # lay kept audio and silent placeholders out, parts found in the cache go in as known audio
+        cond_parts, mask_parts, placements, offset = [], [], [], window_start
+        for i in indices:
+            start_frame, end_frame, new_frames = frame_parts[i]
+            cond_parts.append(audio[:, offset * hop_length : start_frame * hop_length])
+            mask_parts.append(torch.ones(start_frame - offset, dtype=torch.bool))
+            placements.append((i, sum(part.shape[-1] for part in cond_parts)))
+            if part_waves[i] is None:
+                cond_parts.append(torch.zeros(1, new_frames * hop_length))
+                mask_parts.append(torch.zeros(new_frames, dtype=torch.bool))
+            else:
+                cond_parts.append(torch.from_numpy(part_waves[i]).unsqueeze(0) * gain)
+                mask_parts.append(torch.ones(new_frames, dtype=torch.bool))
+            offset = end_frame
+        cond_parts.append(audio[:, offset * hop_length : window_end * hop_length])
+
+        cond = torch.cat(cond_parts, dim=-1).to(device)
+        duration = cond.shape[-1] // hop_length + 1
+        if duration > model_obj.max_duration:
+            raise ValueError(
+                f"Edit window of {duration} frames exceeds the model's {model_obj.max_duration}, "
+                "pass word_times (see edit_windows) to infill long clips span by span."
+            )
+        edit_mask = torch.cat(mask_parts)
+        edit_mask = F.pad(edit_mask, (0, duration - edit_mask.shape[-1]), value=True).unsqueeze(0).to(device)
+        show_info(f"Infilling {len(indices)} spans, {int((~edit_mask).sum())} of {duration} frames...")
+        final_text_list = convert_char_to_pinyin([window_text])
 
-    # Create a combined spectrogram
-    combined_spectrogram = np.concatenate(spectrograms, axis=1)
+        # inference
+        with torch.inference_mode():
+            generated, _ = model_obj.sample(
+                cond=cond,
+                text=final_text_list,
+                duration=duration,
+                steps=nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                edit_mask=edit_mask,
+                fused_cfg=fused_cfg,
+            )
 
-    return final_wave, target_sample_rate, combined_spectrogram
+        generated = generated.to(torch.float32)[:, :duration, :]
+        (generated_wave,) = vocode_batch([generated[0].T], vocoder)
+        if rms < target_rms:
+            generated_wave = generated_wave * rms / target_rms
+        generated_wave = generated_wave.cpu().numpy()
+        generated_wave = np.pad(generated_wave, (0, max(cond.shape[-1] - generated_wave.shape[-1], 0)))
+        for i, position in placements:
+            if part_waves[i] is None:
+                part_waves[i] = generated_wave[position : position + frame_parts[i][2] * hop_length]
+                if snippet_keys[i] is not None:
+                    snippet_cache.put(snippet_keys[i], part_waves[i])
+
+    # splice: kept audio verbatim from the source, edited spans from the cache or the generated waves
+    pieces, offset = [], 0
+    for (start_frame, end_frame, _), part_wave in zip(frame_parts, part_waves):
+        pieces += [source[offset * hop_length : start_frame * hop_length], part_wave]
+        offset = end_frame
+    pieces.append(source[offset * hop_length :])
+    final_wave = np.concatenate(pieces).astype(source.dtype)
+
+    # the spectrogram of the spliced result
+    with torch.inference_mode():
+        generated_mel_spec = model_obj.mel_spec(torch.from_numpy(final_wave).unsqueeze(0).to(device))
+    return final_wave, target_sample_rate, generated_mel_spec[0].cpu().numpy()
 
 
 # remove silence from generated wav
@@ -1,10 +1,27 @@
-from f5_tts.model.cfm import CFM
+import importlib
 
-from f5_tts.model.backbones.unett import UNetT
-from f5_tts.model.backbones.dit import DiT
-from f5_tts.model.backbones.mmdit import MMDiT
+# attributes are imported on first access, so inference never loads the training stack behind Trainer
+# (wandb, accelerate, ema_pytorch, datasets) just by importing the model classes
 
-from f5_tts.model.trainer import Trainer
+_lazy_attrs = {
+    "CFM": "f5_tts.model.cfm",
+    "UNetT": "f5_tts.model.backbones.unett",
+    "DiT": "f5_tts.model.backbones.dit",
+    "MMDiT": "f5_tts.model.backbones.mmdit",
+    "Trainer": "f5_tts.model.trainer",
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_attrs:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy_attrs[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attrs))
 
 
 __all__ = ["CFM", "UNetT", "DiT", "MMDiT", "Trainer"]
@@ -50,7 +50,9 @@ class TextEmbedding(nn.Module):
         batch, text_len = text.shape[0], text.shape[1]
         text = F.pad(text, (0, seq_len - text_len), value=0)
 
-        if drop_text:  # cfg for text
+        if isinstance(drop_text, torch.Tensor):  # per-sample cfg for text, b
+            text = text.masked_fill(drop_text[:, None], 0)
+        elif drop_text:  # cfg for text
             text = torch.zeros_like(text)
 
         text = self.text_embed(text)  # b n -> b n d
@@ -75,14 +77,24 @@ class TextEmbedding(nn.Module):
 class InputEmbedding(nn.Module):
     def __init__(self, mel_dim, text_dim, out_dim):
         super().__init__()
+        self.mel_dim = mel_dim
         self.proj = nn.Linear(mel_dim * 2 + text_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(dim=out_dim)
 
     def forward(self, x: float["b n d"], cond: float["b n d"], text_embed: float["b n d"], drop_audio_cond=False):  # noqa: F722
-        if drop_audio_cond:  # cfg for cond audio
+        return self.step(x, self.prepare(cond, text_embed, drop_audio_cond=drop_audio_cond))
+
+    def prepare(self, cond: float["b n d"], text_embed: float["b n d"], drop_audio_cond=False):  # noqa: F722
+        # the cond & text half of proj, fixed for a whole sampling run
+        if isinstance(drop_audio_cond, torch.Tensor):  # per-sample cfg for cond audio, b
+            cond = cond.masked_fill(drop_audio_cond[:, None, None], 0.0)
+        elif drop_audio_cond:  # cfg for cond audio
             cond = torch.zeros_like(cond)
 
-        x = self.proj(torch.cat((x, cond, text_embed), dim=-1))
+        return F.linear(torch.cat((cond, text_embed), dim=-1), self.proj.weight[:, self.mel_dim :], self.proj.bias)
+
+    def step(self, x: float["b n d"], cond_embed: float["b n d"]):  # noqa: F722
+        x = F.linear(x, self.proj.weight[:, : self.mel_dim]) + cond_embed
         x = self.conv_pos_embed(x) + x
         return x
 
@@ -133,31 +145,75 @@ class DiT(nn.Module):
         cond: float["b n d"],  # masked cond audio  # noqa: F722
         text: int["b nt"],  # text  # noqa: F722
         time: float["b"] | float[""],  # time step  # noqa: F821 F722
-        drop_audio_cond,  # cfg for cond audio
-        drop_text,  # cfg for text
+        drop_audio_cond,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text,  # cfg for text, bool or bool["b"] per sample
         mask: bool["b n"] | None = None,  # noqa: F722
     ):
-        batch, seq_len = x.shape[0], x.shape[1]
-        if time.ndim == 0:
-            time = time.repeat(batch)
+        ctx = self.prepare(cond, text, drop_audio_cond=drop_audio_cond, drop_text=drop_text, mask=mask)
+        return self.step(x, time, ctx)
+
+    def prepare(
+        self,
+        cond: float["b n d"],  # masked cond audio  # noqa: F722
+        text: int["b nt"],  # text  # noqa: F722
+        drop_audio_cond=False,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text=False,  # cfg for text, bool or bool["b"] per sample
+        mask: bool["b n"] | None = None,  # noqa: F722
+    ) -> dict:
+        # everything not depending on x or time, reusable across all ode steps of one sampling run
+        seq_len = cond.shape[1]
 
-        # t: conditioning time, c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
+        # c: context (text + masked cond audio)
         text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
-        x = self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+        cond_embed = self.input_embed.prepare(cond, text_embed, drop_audio_cond=drop_audio_cond)
 
         rope = self.rotary_embed.forward_from_seq_len(seq_len)
 
+        return dict(cond_embed=cond_embed, rope=rope, mask=mask)
+
+    def prepare_schedule(self, times: float["s"]) -> dict:  # noqa: F821
+        # time embedding and every adaln modulation for all ode time points, one matmul per layer over the schedule
+        t = self.time_embed(times)
+        return dict(
+            index={time: i for i, time in enumerate(times.tolist())},
+            t=t,
+            block_mods=[block.attn_norm.modulation(t) for block in self.transformer_blocks],
+            out_mod=self.norm_out.modulation(t),
+        )
+
+    def step(
+        self,
+        x: float["b n d"],  # nosied input audio  # noqa: F722
+        time: float["b"] | float[""],  # time step  # noqa: F821 F722
+        ctx: dict,  # from prepare(), optionally with a "schedule" from prepare_schedule()
+    ):
+        batch = x.shape[0]
+        schedule = ctx.get("schedule")
+        idx = schedule["index"].get(time.item()) if schedule is not None and time.ndim == 0 else None
+
+        # t: conditioning time, x: noised input audio
+        if idx is not None:  # time point on the precomputed schedule
+            t = schedule["t"][idx].expand(batch, -1)
+            block_mods = [mod[idx].expand(batch, -1) for mod in schedule["block_mods"]]
+            out_mod = schedule["out_mod"][idx].expand(batch, -1)
+        else:
+            if time.ndim == 0:
+                time = time.repeat(batch)
+            t = self.time_embed(time)
+            block_mods = [None] * self.depth
+            out_mod = None
+        x = self.input_embed.step(x, ctx["cond_embed"])
+
         if self.long_skip_connection is not None:
             residual = x
 
-        for block in self.transformer_blocks:
-            x = block(x, t, mask=mask, rope=rope)
+        for block, mod in zip(self.transformer_blocks, block_mods):
+            x = block(x, t, mask=ctx["mask"], rope=ctx["rope"], mod=mod)
 
         if self.long_skip_connection is not None:
             x = self.long_skip_connection(torch.cat((x, residual), dim=-1))
 
-        x = self.norm_out(x, t)
+        x = self.norm_out(x, t, mod=out_mod)
         output = self.proj_out(x)
 
         return output
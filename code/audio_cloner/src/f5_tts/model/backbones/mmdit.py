@@ -11,6 +11,7 @@ from __future__ import annotations
 
 import torch
 from torch import nn
+import torch.nn.functional as F
 
 from x_transformers.x_transformers import RotaryEmbedding
 
@@ -37,7 +38,9 @@ class TextEmbedding(nn.Module):
 
     def forward(self, text: int["b nt"], drop_text=False) -> int["b nt d"]:  # noqa: F722
         text = text + 1
-        if drop_text:
+        if isinstance(drop_text, torch.Tensor):  # per-sample cfg for text, b
+            text = text.masked_fill(drop_text[:, None], 0)
+        elif drop_text:
             text = torch.zeros_like(text)
         text = self.text_embed(text)
 
@@ -58,14 +61,23 @@ class TextEmbedding(nn.Module):
 class AudioEmbedding(nn.Module):
     def __init__(self, in_dim, out_dim):
         super().__init__()
+        self.in_dim = in_dim
         self.linear = nn.Linear(2 * in_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(out_dim)
 
     def forward(self, x: float["b n d"], cond: float["b n d"], drop_audio_cond=False):  # noqa: F722
-        if drop_audio_cond:
+        return self.step(x, self.prepare(cond, drop_audio_cond=drop_audio_cond))
+
+    def prepare(self, cond: float["b n d"], drop_audio_cond=False):  # noqa: F722
+        # the cond half of linear, fixed for a whole sampling run
+        if isinstance(drop_audio_cond, torch.Tensor):  # per-sample cfg for cond audio, b
+            cond = cond.masked_fill(drop_audio_cond[:, None, None], 0.0)
+        elif drop_audio_cond:
             cond = torch.zeros_like(cond)
-        x = torch.cat((x, cond), dim=-1)
-        x = self.linear(x)
+        return F.linear(cond, self.linear.weight[:, self.in_dim :], self.linear.bias)
+
+    def step(self, x: float["b n d"], cond_embed: float["b n d"]):  # noqa: F722
+        x = F.linear(x, self.linear.weight[:, : self.in_dim]) + cond_embed
         x = self.conv_pos_embed(x) + x
         return x
 
@@ -119,28 +131,75 @@ class MMDiT(nn.Module):
         cond: float["b n d"],  # masked cond audio  # noqa: F722
         text: int["b nt"],  # text  # noqa: F722
         time: float["b"] | float[""],  # time step  # noqa: F821 F722
-        drop_audio_cond,  # cfg for cond audio
-        drop_text,  # cfg for text
+        drop_audio_cond,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text,  # cfg for text, bool or bool["b"] per sample
         mask: bool["b n"] | None = None,  # noqa: F722
     ):
-        batch = x.shape[0]
-        if time.ndim == 0:
-            time = time.repeat(batch)
+        ctx = self.prepare(cond, text, drop_audio_cond=drop_audio_cond, drop_text=drop_text, mask=mask)
+        return self.step(x, time, ctx)
 
-        # t: conditioning (time), c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
+    def prepare(
+        self,
+        cond: float["b n d"],  # masked cond audio  # noqa: F722
+        text: int["b nt"],  # text  # noqa: F722
+        drop_audio_cond=False,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text=False,  # cfg for text, bool or bool["b"] per sample
+        mask: bool["b n"] | None = None,  # noqa: F722
+    ) -> dict:
+        # everything not depending on x or time, reusable across all ode steps of one sampling run
+        # c: context (text + masked cond audio)
         c = self.text_embed(text, drop_text=drop_text)
-        x = self.audio_embed(x, cond, drop_audio_cond=drop_audio_cond)
+        cond_embed = self.audio_embed.prepare(cond, drop_audio_cond=drop_audio_cond)
 
-        seq_len = x.shape[1]
+        seq_len = cond.shape[1]
         text_len = text.shape[1]
         rope_audio = self.rotary_embed.forward_from_seq_len(seq_len)
         rope_text = self.rotary_embed.forward_from_seq_len(text_len)
 
-        for block in self.transformer_blocks:
-            c, x = block(x, c, t, mask=mask, rope=rope_audio, c_rope=rope_text)
+        return dict(c=c, cond_embed=cond_embed, rope_audio=rope_audio, rope_text=rope_text, mask=mask)
+
+    def prepare_schedule(self, times: float["s"]) -> dict:  # noqa: F821
+        # time embedding and every adaln modulation for all ode time points, one matmul per layer over the schedule
+        t = self.time_embed(times)
+        return dict(
+            index={time: i for i, time in enumerate(times.tolist())},
+            t=t,
+            c_mods=[block.attn_norm_c.modulation(t) for block in self.transformer_blocks],
+            x_mods=[block.attn_norm_x.modulation(t) for block in self.transformer_blocks],
+            out_mod=self.norm_out.modulation(t),
+        )
 
-        x = self.norm_out(x, t)
+    def step(
+        self,
+        x: float["b n d"],  # nosied input audio  # noqa: F722
+        time: float["b"] | float[""],  # time step  # noqa: F821 F722
+        ctx: dict,  # from prepare(), optionally with a "schedule" from prepare_schedule()
+    ):
+        batch = x.shape[0]
+        schedule = ctx.get("schedule")
+        idx = schedule["index"].get(time.item()) if schedule is not None and time.ndim == 0 else None
+
+        # t: conditioning (time), x: noised input audio
+        if idx is not None:  # time point on the precomputed schedule
+            t = schedule["t"][idx].expand(batch, -1)
+            c_mods = [mod[idx].expand(batch, -1) for mod in schedule["c_mods"]]
+            x_mods = [mod[idx].expand(batch, -1) for mod in schedule["x_mods"]]
+            out_mod = schedule["out_mod"][idx].expand(batch, -1)
+        else:
+            if time.ndim == 0:
+                time = time.repeat(batch)
+            t = self.time_embed(time)
+            c_mods = x_mods = [None] * self.depth
+            out_mod = None
+        c = ctx["c"]
+        x = self.audio_embed.step(x, ctx["cond_embed"])
+
+        for block, c_mod, x_mod in zip(self.transformer_blocks, c_mods, x_mods):
+            c, x = block(
+                x, c, t, mask=ctx["mask"], rope=ctx["rope_audio"], c_rope=ctx["rope_text"], c_mod=c_mod, x_mod=x_mod
+            )
+
+        x = self.norm_out(x, t, mod=out_mod)
         output = self.proj_out(x)
 
         return output
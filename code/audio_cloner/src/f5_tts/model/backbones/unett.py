@@ -53,7 +53,9 @@ class TextEmbedding(nn.Module):
         batch, text_len = text.shape[0], text.shape[1]
         text = F.pad(text, (0, seq_len - text_len), value=0)
 
-        if drop_text:  # cfg for text
+        if isinstance(drop_text, torch.Tensor):  # per-sample cfg for text, b
+            text = text.masked_fill(drop_text[:, None], 0)
+        elif drop_text:  # cfg for text
             text = torch.zeros_like(text)
 
         text = self.text_embed(text)  # b n -> b n d
@@ -78,14 +80,24 @@ class TextEmbedding(nn.Module):
 class InputEmbedding(nn.Module):
     def __init__(self, mel_dim, text_dim, out_dim):
         super().__init__()
+        self.mel_dim = mel_dim
         self.proj = nn.Linear(mel_dim * 2 + text_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(dim=out_dim)
 
     def forward(self, x: float["b n d"], cond: float["b n d"], text_embed: float["b n d"], drop_audio_cond=False):  # noqa: F722
-        if drop_audio_cond:  # cfg for cond audio
+        return self.step(x, self.prepare(cond, text_embed, drop_audio_cond=drop_audio_cond))
+
+    def prepare(self, cond: float["b n d"], text_embed: float["b n d"], drop_audio_cond=False):  # noqa: F722
+        # the cond & text half of proj, fixed for a whole sampling run
+        if isinstance(drop_audio_cond, torch.Tensor):  # per-sample cfg for cond audio, b
+            cond = cond.masked_fill(drop_audio_cond[:, None, None], 0.0)
+        elif drop_audio_cond:  # cfg for cond audio
             cond = torch.zeros_like(cond)
 
-        x = self.proj(torch.cat((x, cond, text_embed), dim=-1))
+        return F.linear(torch.cat((cond, text_embed), dim=-1), self.proj.weight[:, self.mel_dim :], self.proj.bias)
+
+    def step(self, x: float["b n d"], cond_embed: float["b n d"]):  # noqa: F722
+        x = F.linear(x, self.proj.weight[:, : self.mel_dim]) + cond_embed
         x = self.conv_pos_embed(x) + x
         return x
 
@@ -167,26 +179,62 @@ class UNetT(nn.Module):
         cond: float["b n d"],  # masked cond audio  # noqa: F722
         text: int["b nt"],  # text  # noqa: F722
         time: float["b"] | float[""],  # time step  # noqa: F821 F722
-        drop_audio_cond,  # cfg for cond audio
-        drop_text,  # cfg for text
+        drop_audio_cond,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text,  # cfg for text, bool or bool["b"] per sample
         mask: bool["b n"] | None = None,  # noqa: F722
     ):
-        batch, seq_len = x.shape[0], x.shape[1]
-        if time.ndim == 0:
-            time = time.repeat(batch)
+        ctx = self.prepare(cond, text, drop_audio_cond=drop_audio_cond, drop_text=drop_text, mask=mask)
+        return self.step(x, time, ctx)
 
-        # t: conditioning time, c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
+    def prepare(
+        self,
+        cond: float["b n d"],  # masked cond audio  # noqa: F722
+        text: int["b nt"],  # text  # noqa: F722
+        drop_audio_cond=False,  # cfg for cond audio, bool or bool["b"] per sample
+        drop_text=False,  # cfg for text, bool or bool["b"] per sample
+        mask: bool["b n"] | None = None,  # noqa: F722
+    ) -> dict:
+        # everything not depending on x or time, reusable across all ode steps of one sampling run
+        seq_len = cond.shape[1]
+
+        # c: context (text + masked cond audio)
         text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
-        x = self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+        cond_embed = self.input_embed.prepare(cond, text_embed, drop_audio_cond=drop_audio_cond)
 
-        # postfix time t to input x, [b n d] -> [b n+1 d]
-        x = torch.cat([t.unsqueeze(1), x], dim=1)  # pack t to x
+        # mask and rope account for the time token packed in front of x
         if mask is not None:
             mask = F.pad(mask, (1, 0), value=1)
-
         rope = self.rotary_embed.forward_from_seq_len(seq_len + 1)
 
+        return dict(cond_embed=cond_embed, rope=rope, mask=mask)
+
+    def prepare_schedule(self, times: float["s"]) -> dict:  # noqa: F821
+        # time embedding for all ode time points at once
+        return dict(index={time: i for i, time in enumerate(times.tolist())}, t=self.time_embed(times))
+
+    def step(
+        self,
+        x: float["b n d"],  # nosied input audio  # noqa: F722
+        time: float["b"] | float[""],  # time step  # noqa: F821 F722
+        ctx: dict,  # from prepare(), optionally with a "schedule" from prepare_schedule()
+    ):
+        batch = x.shape[0]
+        schedule = ctx.get("schedule")
+        idx = schedule["index"].get(time.item()) if schedule is not None and time.ndim == 0 else None
+
+        # t: conditioning time, x: noised input audio
+        if idx is not None:  # time point on the precomputed schedule
+            t = schedule["t"][idx].expand(batch, -1)
+        else:
+            if time.ndim == 0:
+                time = time.repeat(batch)
+            t = self.time_embed(time)
+        x = self.input_embed.step(x, ctx["cond_embed"])
+
+        # postfix time t to input x, [b n d] -> [b n+1 d]
+        x = torch.cat([t.unsqueeze(1), x], dim=1)  # pack t to x
+        mask, rope = ctx["mask"], ctx["rope"]
+
         # flat unet transformer
         skip_connect_type = self.skip_connect_type
         skips = []
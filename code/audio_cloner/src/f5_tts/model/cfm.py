@@ -46,6 +46,7 @@ class CFM(nn.Module):
         mel_spec_kwargs: dict = dict(),
         frac_lengths_mask: tuple[float, float] = (0.7, 1.0),
         vocab_char_map: dict[str:int] | None = None,
+        max_duration=4096,
     ):
         super().__init__()
 
@@ -70,6 +71,7 @@ class CFM(nn.Module):
 
         # sampling related
         self.odeint_kwargs = odeint_kwargs
+        self.max_duration = max_duration  # longest sequence sample() generates, in mel frames (cond included)
 
         # vocab map for tokenization
         self.vocab_char_map = vocab_char_map
@@ -89,13 +91,14 @@ class CFM(nn.Module):
         steps=32,
         cfg_strength=1.0,
         sway_sampling_coef=None,
-        seed: int | None = None,
-        max_duration=4096,
+        seed: int | list[int | None] | None = None,
+        max_duration=None,
         vocoder: Callable[[float["b d n"]], float["b nw"]] | None = None,  # noqa: F722
         no_ref_audio=False,
         duplicate_test=False,
         t_inter=0.1,
         edit_mask=None,
+        fused_cfg=False,
     ):
         self.eval()
 
@@ -136,7 +139,7 @@ class CFM(nn.Module):
             duration = torch.full((batch,), duration, device=device, dtype=torch.long)
 
         duration = torch.maximum(lens + 1, duration)  # just add one token so something is generated
-        duration = duration.clamp(max=max_duration)
+        duration = duration.clamp(max=default(max_duration, self.max_duration))
         max_duration = duration.amax()
 
         # duplicate test corner for inner time step oberservation
@@ -159,31 +162,53 @@ class CFM(nn.Module):
         if no_ref_audio:
             cond = torch.zeros_like(cond)
 
+        # text, cond and rope are fixed for the whole run, so the backbone context is prepared once, not per step
+        use_cfg = cfg_strength >= 1e-5
+        if fused_cfg and use_cfg:
+            # fused cfg: stack cond and null inputs into one 2b batch, dropped per sample, for a single forward per step
+            cfg_drop = torch.arange(2 * batch, device=device) >= batch
+            ctx = self.transformer.prepare(
+                cond=torch.cat((step_cond, step_cond), dim=0),
+                text=torch.cat((text, text), dim=0),
+                drop_audio_cond=cfg_drop,
+                drop_text=cfg_drop,
+                mask=torch.cat((mask, mask), dim=0) if exists(mask) else None,
+            )
+        else:
+            ctx = self.transformer.prepare(cond=step_cond, text=text, drop_audio_cond=False, drop_text=False, mask=mask)
+            null_ctx = None
+            if use_cfg:
+                null_ctx = self.transformer.prepare(
+                    cond=step_cond, text=text, drop_audio_cond=True, drop_text=True, mask=mask
+                )
+
         # neural ode
 
         def fn(t, x):
             # at each step, conditioning is fixed
             # step_cond = torch.where(cond_mask, cond, torch.zeros_like(cond))
 
+            if fused_cfg and use_cfg:
+                pred, null_pred = self.transformer.step(x=torch.cat((x, x), dim=0), time=t, ctx=ctx).chunk(2, dim=0)
+                return pred + (pred - null_pred) * cfg_strength
+
             # predict flow
-            pred = self.transformer(
-                x=x, cond=step_cond, text=text, time=t, mask=mask, drop_audio_cond=False, drop_text=False
-            )
-            if cfg_strength < 1e-5:
+            pred = self.transformer.step(x=x, time=t, ctx=ctx)
+            if not use_cfg:
                 return pred
 
-            null_pred = self.transformer(
-                x=x, cond=step_cond, text=text, time=t, mask=mask, drop_audio_cond=True, drop_text=True
-            )
+            null_pred = self.transformer.step(x=x, time=t, ctx=null_ctx)
             return pred + (pred - null_pred) * cfg_strength
 
         # noise input
         # to make sure batch inference result is same with different batch size, and for sure single inference
         # still some difference maybe due to convolutional layers
         y0 = []
-        for dur in duration:
-            if exists(seed):
-                torch.manual_seed(seed)
+        # seed may also be a list, one per batch item, so batched requests keep their own noise
+        seeds = seed if isinstance(seed, (list, tuple)) else [seed] * len(duration)
+        for dur, item_seed in zip(duration, seeds):
+            if exists(item_seed):
+                torch.manual_seed(item_seed)
             y0.append(torch.randn(dur, self.num_channels, device=self.device, dtype=step_cond.dtype))
         y0 = pad_sequence(y0, padding_value=0, batch_first=True)
 
@@ -199,6 +224,11 @@ class CFM(nn.Module):
         if sway_sampling_coef is not None:
             t = t + sway_sampling_coef * (torch.cos(torch.pi / 2 * t) - 1 + t)
 
+        # time embeddings & adaln modulations only depend on the time grid, so computed for every step up front
+        ctx["schedule"] = self.transformer.prepare_schedule(t)
+        if not fused_cfg and use_cfg:
+            null_ctx["schedule"] = ctx["schedule"]
+
         trajectory = odeint(fn, y0, t, **self.odeint_kwargs)
 
         sampled = trajectory[-1]
@@ -205,13 +205,17 @@ class AdaLayerNormZero(nn.Module):
 
         self.norm = nn.LayerNorm(dim, elementwise_affine=False, eps=1e-6)
 
-    def forward(self, x, emb=None):
-        emb = self.linear(self.silu(emb))
-        shift_msa, scale_msa, gate_msa, shift_mlp, scale_mlp, gate_mlp = torch.chunk(emb, 6, dim=1)
+    def forward(self, x, emb=None, mod=None):  # mod: precomputed modulation(emb)
+        if mod is None:
+            mod = self.modulation(emb)
+        shift_msa, scale_msa, gate_msa, shift_mlp, scale_mlp, gate_mlp = torch.chunk(mod, 6, dim=1)
 
         x = self.norm(x) * (1 + scale_msa[:, None]) + shift_msa[:, None]
         return x, gate_msa, shift_mlp, scale_mlp, gate_mlp
 
+    def modulation(self, emb):
+        return self.linear(self.silu(emb))
+
 
 # AdaLayerNormZero for final layer
 # return only with modulated x for attn input, cuz no more mlp modulation
@@ -226,13 +230,17 @@ class AdaLayerNormZero_Final(nn.Module):
 
         self.norm = nn.LayerNorm(dim, elementwise_affine=False, eps=1e-6)
 
-    def forward(self, x, emb):
-        emb = self.linear(self.silu(emb))
-        scale, shift = torch.chunk(emb, 2, dim=1)
+    def forward(self, x, emb=None, mod=None):  # mod: precomputed modulation(emb)
+        if mod is None:
+            mod = self.modulation(emb)
+        scale, shift = torch.chunk(mod, 2, dim=1)
 
         x = self.norm(x) * (1 + scale)[:, None, :] + shift[:, None, :]
         return x
 
+    def modulation(self, emb):
+        return self.linear(self.silu(emb))
+
 
 # FeedForward
 
@@ -478,9 +486,9 @@ class DiTBlock(nn.Module):
         self.ff_norm = nn.LayerNorm(dim, elementwise_affine=False, eps=1e-6)
         self.ff = FeedForward(dim=dim, mult=ff_mult, dropout=dropout, approximate="tanh")
 
-    def forward(self, x, t, mask=None, rope=None):  # x: noised input, t: time embedding
+    def forward(self, x, t, mask=None, rope=None, mod=None):  # x: noised input, t: time embedding
         # pre-norm & modulation for attention input
-        norm, gate_msa, shift_mlp, scale_mlp, gate_mlp = self.attn_norm(x, emb=t)
+        norm, gate_msa, shift_mlp, scale_mlp, gate_mlp = self.attn_norm(x, emb=t, mod=mod)
 
         # attention
         attn_output = self.attn(x=norm, mask=mask, rope=rope)
@@ -534,13 +542,14 @@ class MMDiTBlock(nn.Module):
         self.ff_norm_x = nn.LayerNorm(dim, elementwise_affine=False, eps=1e-6)
         self.ff_x = FeedForward(dim=dim, mult=ff_mult, dropout=dropout, approximate="tanh")
 
-    def forward(self, x, c, t, mask=None, rope=None, c_rope=None):  # x: noised input, c: context, t: time embedding
+    def forward(self, x, c, t, mask=None, rope=None, c_rope=None, c_mod=None, x_mod=None):
+        # x: noised input, c: context, t: time embedding, c_mod & x_mod: precomputed modulations
         # pre-norm & modulation for attention input
         if self.context_pre_only:
-            norm_c = self.attn_norm_c(c, t)
+            norm_c = self.attn_norm_c(c, t, mod=c_mod)
         else:
-            norm_c, c_gate_msa, c_shift_mlp, c_scale_mlp, c_gate_mlp = self.attn_norm_c(c, emb=t)
-        norm_x, x_gate_msa, x_shift_mlp, x_scale_mlp, x_gate_mlp = self.attn_norm_x(x, emb=t)
+            norm_c, c_gate_msa, c_shift_mlp, c_scale_mlp, c_gate_mlp = self.attn_norm_c(c, emb=t, mod=c_mod)
+        norm_x, x_gate_msa, x_shift_mlp, x_scale_mlp, x_gate_mlp = self.attn_norm_x(x, emb=t, mod=x_mod)
 
         # attention
         x_attn_output, c_attn_output = self.attn(x=norm_x, c=norm_c, mask=mask, rope=rope, c_rope=c_rope)
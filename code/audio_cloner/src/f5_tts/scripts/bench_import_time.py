@@ -0,0 +1,39 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# cold import time of the inference entry point, each run in a fresh interpreter
+# also fails if the import pulled in the training stack, which inference should never load
+
+training_modules = ["f5_tts.model.trainer", "wandb", "accelerate", "ema_pytorch", "datasets", "bitsandbytes"]
+
+probe = """
+import json, sys, time
+start = time.perf_counter()
+from {module} import {name}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {training_modules!r} if m in sys.modules]}}))
+"""
+
+parser = argparse.ArgumentParser(description="Measure the cold import time of F5TTS")
+parser.add_argument("--runs", type=int, default=5)
+parser.add_argument("--module", default="f5_tts.api")
+parser.add_argument("--name", default="F5TTS")
+args = parser.parse_args()
+
+code = probe.format(module=args.module, name=args.name, training_modules=training_modules)
+times, loaded = [], set()
+for _ in range(args.runs):
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    times.append(result["seconds"])
+    loaded.update(result["loaded"])
+
+print(f"from {args.module} import {args.name}, {args.runs} cold runs")
+print(f"median: {statistics.median(times):.3f} s, min: {min(times):.3f} s, max: {max(times):.3f} s")
+if loaded:
+    print(f"training modules imported: {', '.join(sorted(loaded))}")
+    sys.exit(1)
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+from torch import nn
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from f5_tts.model import CFM  # noqa: E402
+from f5_tts.model import DiT  # noqa: E402
+
+
+vocab_char_map = {char: i for i, char in enumerate(" abcdefghijklmnopqrstuvwxyz0123456789.,?")}
+
+
+# a vocoder stand-in: a conv over mel frames, so it has Vocos' interface and a receptive field of a few frames
+
+
+class ConvVocoder(nn.Module):
+    def __init__(self, n_mel_channels=100, hop_length=256, kernel_size=7):
+        super().__init__()
+        self.conv = nn.Conv1d(n_mel_channels, hop_length, kernel_size, padding=kernel_size // 2)
+
+    @torch.inference_mode()
+    def decode(self, mel):  # b d n -> b n*hop
+        return torch.tanh(self.conv(mel)).transpose(1, 2).reshape(mel.shape[0], -1)
+
+
+@pytest.fixture
+def tiny_cfm():
+    torch.manual_seed(0)
+    transformer = DiT(
+        dim=64,
+        depth=2,
+        heads=2,
+        ff_mult=2,
+        text_dim=32,
+        conv_layers=1,
+        text_num_embeds=len(vocab_char_map),
+        mel_dim=100,
+    )
+    return CFM(transformer=transformer, vocab_char_map=vocab_char_map).eval()
+
+
+@pytest.fixture
+def vocoder():
+    torch.manual_seed(1)
+    return ConvVocoder().eval()
@@ -0,0 +1,49 @@
+import torch
+
+from f5_tts.infer.batch_scheduler import BatchScheduler
+from f5_tts.infer.utils_infer import estimate_duration
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+ref_text = "a reference line."
+gen_texts = ["hi.", "a bit longer this time.", "the longest of the three texts, by far."]
+
+
+def test_each_future_gets_its_own_result(tiny_cfm, vocoder):
+    torch.manual_seed(4)
+    ref_audio = (0.1 * torch.randn(1, target_sample_rate), target_sample_rate)
+    ref_audio_len = target_sample_rate // hop_length
+
+    with BatchScheduler(
+        tiny_cfm, max_wait=1.0, bucket_frames=1024, nfe_step=2, vocoder=vocoder, device="cpu"
+    ) as scheduler:
+        futures = [scheduler.submit(ref_audio, ref_text, gen_text, seed=7) for gen_text in gen_texts]
+        results = [future.result() for future in futures]
+    assert scheduler.requests == len(gen_texts) and scheduler.batches == 1
+
+    # the texts differ in length, so every result's length tells whose it is
+    for gen_text, (wave, sample_rate, spect) in zip(gen_texts, results):
+        # the scheduler spaces the reference and generated texts apart
+        frames = estimate_duration(ref_audio_len, ref_text + " ", gen_text) - ref_audio_len
+        assert sample_rate == target_sample_rate
+        assert spect.shape == (100, frames)
+        assert wave.shape == (frames * hop_length,)
+
+    # and the same request sampled on its own, with the same seed, gives the same mel
+    with BatchScheduler(tiny_cfm, max_wait=0, nfe_step=2, vocoder=vocoder, device="cpu") as scheduler:
+        alone = scheduler.infer(ref_audio, ref_text, gen_texts[-1], seed=7)
+    torch.testing.assert_close(torch.from_numpy(alone[2]), torch.from_numpy(results[-1][2]), atol=1e-4, rtol=1e-4)
+
+
+def test_failed_batch_fails_its_futures(tiny_cfm, vocoder):
+    ref_audio = (0.1 * torch.randn(1, target_sample_rate), target_sample_rate)
+
+    def broken_decode(mel):
+        raise RuntimeError("vocoder failed")
+
+    vocoder.decode = broken_decode
+    with BatchScheduler(tiny_cfm, max_wait=0.5, nfe_step=2, vocoder=vocoder, device="cpu") as scheduler:
+        futures = [scheduler.submit(ref_audio, ref_text, gen_text) for gen_text in gen_texts[:2]]
+        for future in futures:
+            assert isinstance(future.exception(), RuntimeError)
@@ -0,0 +1,56 @@
+import torch
+
+
+def sample(model, cond, text, duration, lens, **kwargs):
+    with torch.inference_mode():
+        generated, _ = model.sample(cond=cond, text=text, duration=duration, lens=lens, steps=4, **kwargs)
+    return generated
+
+
+def test_batched_seeds_match_single_samples(tiny_cfm):
+    torch.manual_seed(3)
+    # equal lengths, padding alone changes the convolutions of a shorter item
+    conds = [torch.randn(40, 100), torch.randn(40, 100)]
+    texts = ["hello there", "and another"]
+    durations = [90, 90]
+    singles = [
+        sample(tiny_cfm, cond[None], [text], torch.tensor([dur]), torch.tensor([len(cond)]), seed=seed)[0, :dur]
+        for cond, text, dur, seed in zip(conds, texts, durations, [11, 12])
+    ]
+
+    cond = torch.nn.utils.rnn.pad_sequence(conds, batch_first=True)
+    batched = sample(
+        tiny_cfm, cond, texts, torch.tensor(durations), torch.tensor([len(c) for c in conds]), seed=[11, 12]
+    )
+    for single, generated, dur in zip(singles, batched, durations):
+        torch.testing.assert_close(generated[:dur], single, atol=1e-4, rtol=1e-4)
+
+
+def test_prepare_and_step_match_forward(tiny_cfm):
+    torch.manual_seed(6)
+    transformer = tiny_cfm.transformer
+    x, cond = torch.randn(2, 50, 100), torch.randn(2, 50, 100)
+    text = torch.randint(0, 20, (2, 12))
+    mask = torch.arange(50)[None] < torch.tensor([[50], [41]])
+    times = torch.linspace(0, 1, 5)
+    drop = torch.tensor([False, True])
+    with torch.inference_mode():
+        ctx = transformer.prepare(cond, text, drop_audio_cond=drop, drop_text=drop, mask=mask)
+        scheduled = {**ctx, "schedule": transformer.prepare_schedule(times)}
+        for time in times:
+            expected = transformer(x, cond, text, time, drop_audio_cond=drop, drop_text=drop, mask=mask)
+            torch.testing.assert_close(transformer.step(x, time, ctx), expected)
+            torch.testing.assert_close(transformer.step(x, time, scheduled), expected)
+
+
+def test_fused_cfg_matches_unfused(tiny_cfm):
+    torch.manual_seed(7)
+    cond = torch.randn(2, 40, 100)
+    lens = torch.tensor([40, 32])
+    text = ["hello there", "and another"]
+    duration = torch.tensor([90, 80])
+    unfused = sample(tiny_cfm, cond, text, duration, lens, cfg_strength=2.0, sway_sampling_coef=-1, seed=[1, 2])
+    fused = sample(
+        tiny_cfm, cond, text, duration, lens, cfg_strength=2.0, sway_sampling_coef=-1, seed=[1, 2], fused_cfg=True
+    )
+    torch.testing.assert_close(fused, unfused, atol=1e-4, rtol=1e-4)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from f5_tts.infer.utils_infer import cross_fade_stream
+from f5_tts.infer.utils_infer import cross_fade_waves
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+# the concatenating loop cross_fade_waves replaced
+
+
+def cross_fade_loop(generated_waves, cross_fade_duration):
+    if cross_fade_duration <= 0:
+        return np.concatenate(generated_waves)
+    final_wave = generated_waves[0]
+    for next_wave in generated_waves[1:]:
+        cross_fade_samples = min(int(cross_fade_duration * target_sample_rate), len(final_wave), len(next_wave))
+        if cross_fade_samples <= 0:
+            final_wave = np.concatenate([final_wave, next_wave])
+            continue
+        fade_out = np.linspace(1, 0, cross_fade_samples)
+        fade_in = np.linspace(0, 1, cross_fade_samples)
+        cross_faded_overlap = final_wave[-cross_fade_samples:] * fade_out + next_wave[:cross_fade_samples] * fade_in
+        final_wave = np.concatenate(
+            [final_wave[:-cross_fade_samples], cross_faded_overlap, next_wave[cross_fade_samples:]]
+        )
+    return final_wave
+
+
+@pytest.mark.parametrize("cross_fade_duration", [0, 0.15, 1.0])
+@pytest.mark.parametrize("lengths", [[24000], [24000, 12000, 48000], [100, 24000, 50, 0, 7000]])
+def test_matches_the_loop(lengths, cross_fade_duration):
+    rng = np.random.default_rng(len(lengths))
+    waves = [rng.uniform(-1, 1, length).astype(np.float32) for length in lengths]
+    expected = cross_fade_loop(waves, cross_fade_duration)
+    final_wave = cross_fade_waves(waves, cross_fade_duration)
+    assert final_wave.dtype == np.float32
+    np.testing.assert_allclose(final_wave, expected, atol=1e-6)
+    np.testing.assert_allclose(np.concatenate(list(cross_fade_stream(waves, cross_fade_duration))), expected, atol=1e-6)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+import torch
+
+from f5_tts.infer.utils_infer import edit_process
+from f5_tts.infer.utils_infer import edit_windows
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import locate_edit_parts
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+def silent(*args):
+    pass
+
+
+@pytest.fixture
+def long_clip():
+    # 60 s of noise with a word every half second, longer than the 4096 frames (~43.7 s) sample() generates
+    torch.manual_seed(2)
+    source = 0.1 * torch.randn(60 * target_sample_rate)
+    word_times = [(f"w{i}", i * 0.5 + 0.05, i * 0.5 + 0.4) for i in range(120)]
+    ref_text = " ".join(word for word, _, _ in word_times)
+    return source, word_times, ref_text
+
+
+def test_edit_past_max_duration_is_infilled(tiny_cfm, vocoder, long_clip):
+    source, word_times, ref_text = long_clip
+    gen_text = ref_text.replace("w100", "dana")
+    ref_audio = (source, target_sample_rate)
+    parts = locate_edit_parts(ref_audio, ref_text, gen_text, word_times=word_times)
+    windows = edit_windows(word_times, gen_text, parts, max_duration=tiny_cfm.max_duration)
+
+    (window_start, window_end, window_text, indices) = windows[0]
+    assert len(windows) == 1 and indices == [0]
+    assert window_start <= parts[0][0] < parts[0][1] <= window_end < window_start + 12
+    assert "dana" in window_text and "w100" not in window_text
+
+    wave, _, _ = edit_process(
+        ref_audio,
+        gen_text,
+        parts,
+        tiny_cfm,
+        show_info=silent,
+        nfe_step=2,
+        windows=windows,
+        vocoder=vocoder,
+        device="cpu",
+    )
+    start = round(parts[0][0] * target_sample_rate / hop_length) * hop_length
+    end = round(parts[0][1] * target_sample_rate / hop_length) * hop_length
+    new = round(parts[0][2] * target_sample_rate / hop_length) * hop_length
+    source = source.numpy()
+    assert np.abs(wave[start : start + new]).max() > 0
+    np.testing.assert_array_equal(wave[:start], source[:start])
+    np.testing.assert_array_equal(wave[start + new :], source[end:])
+
+
+def test_edit_whole_clip_past_max_duration_raises(tiny_cfm, vocoder, long_clip):
+    source, word_times, ref_text = long_clip
+    gen_text = ref_text.replace("w100", "dana")
+    ref_audio = (source, target_sample_rate)
+    parts = locate_edit_parts(ref_audio, ref_text, gen_text, word_times=word_times)
+
+    with pytest.raises(ValueError, match="exceeds"):
+        edit_process(ref_audio, gen_text, parts, tiny_cfm, show_info=silent, nfe_step=2, vocoder=vocoder, device="cpu")
+
+
+def test_edit_windows_merge_nearby_runs(long_clip):
+    _, word_times, ref_text = long_clip
+    gen_text = ref_text.replace("w10 ", "anna ").replace("w12 ", "bob ").replace("w90 ", "carl ")
+    parts = locate_edit_parts(
+        (torch.zeros(60 * target_sample_rate), target_sample_rate), ref_text, gen_text, word_times=word_times
+    )
+
+    windows = edit_windows(word_times, gen_text, parts, context=2.0)
+    assert [indices for _, _, _, indices in windows] == [[0, 1], [2]]
+    assert windows[0][1] <= windows[1][0]
+    for window_start, window_end, window_text, _ in windows:
+        kept = [word for word, start, end in word_times if window_start <= start and end <= window_end]
+        assert window_text.split() == [{"w10": "anna", "w12": "bob", "w90": "carl"}.get(word, word) for word in kept]
+
+
+def test_edit_without_changes_returns_the_source(tiny_cfm, vocoder):
+    torch.manual_seed(9)
+    source = 0.1 * torch.randn(3 * target_sample_rate)
+    ref_audio = (source, target_sample_rate)
+    messages = []
+    parts = locate_edit_parts(ref_audio, "hello there", "hello there", spans=[])
+    assert parts == []
+
+    wave, _, spect = edit_process(
+        ref_audio, "hello there", parts, tiny_cfm, show_info=messages.append, nfe_step=2, vocoder=vocoder, device="cpu"
+    )
+    np.testing.assert_array_equal(wave, source.numpy())
+    assert spect.shape[0] == 100
+    assert messages == ["Nothing to edit, returning the source audio..."]
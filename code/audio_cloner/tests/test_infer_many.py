@@ -0,0 +1,59 @@
+import torch
+
+import f5_tts.api as api
+from f5_tts.api import F5TTS
+from f5_tts.infer.utils_infer import estimate_duration
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import infer_many_process
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+ref_text = "a reference line."
+gen_texts = ["hi.", "a bit longer this time.", "the longest of the four texts, by far.", "mid sized one."]
+
+
+def expected_frames(gen_text):
+    # the reference and generated texts are spaced apart
+    ref_audio_len = target_sample_rate // hop_length
+    return estimate_duration(ref_audio_len, ref_text + " ", gen_text) - ref_audio_len
+
+
+def silent(*args):
+    pass
+
+
+def test_one_sized_wave_per_variant(tiny_cfm, vocoder):
+    torch.manual_seed(10)
+    ref_audio = (0.1 * torch.randn(1, target_sample_rate), target_sample_rate)
+    # batches of two, so the sorted variants are split across sample calls and reassembled in order
+    results = infer_many_process(
+        ref_audio,
+        ref_text,
+        gen_texts,
+        tiny_cfm,
+        show_info=silent,
+        nfe_step=2,
+        batch_size=2,
+        vocoder=vocoder,
+        device="cpu",
+    )
+    assert len(results) == len(gen_texts)
+    for gen_text, (wave, sample_rate, spect) in zip(gen_texts, results):
+        assert sample_rate == target_sample_rate
+        assert spect.shape == (100, expected_frames(gen_text))
+        assert wave.shape == (expected_frames(gen_text) * hop_length,)
+
+
+def test_f5tts_infer_many_writes_every_variant(tiny_cfm, vocoder, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "load_vocoder", lambda *args: vocoder)
+    f5tts = object.__new__(F5TTS)
+    f5tts.ema_model, f5tts.device, f5tts.vocoder_local_path = tiny_cfm, "cpu", None
+    f5tts.target_sample_rate = target_sample_rate
+    ref_audio = (0.1 * torch.randn(1, target_sample_rate), target_sample_rate)
+    file_waves = [str(tmp_path / f"variant_{i}.wav") for i in range(len(gen_texts))]
+
+    results = f5tts.infer_many(
+        ref_audio, ref_text, gen_texts, show_info=silent, nfe_step=2, file_waves=file_waves, seed=3
+    )
+    assert [len(wave) for wave, _, _ in results] == [expected_frames(text) * hop_length for text in gen_texts]
+    assert all((tmp_path / f"variant_{i}.wav").exists() for i in range(len(gen_texts)))
@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+import torch
+
+from f5_tts.infer.pack_cli import pack_checkpoint
+from f5_tts.infer.utils_infer import load_checkpoint
+from f5_tts.infer.utils_infer import load_inference_state_dict
+from f5_tts.infer.utils_infer import read_pack_metadata
+
+
+@pytest.fixture
+def training_ckpt(tiny_cfm, tmp_path):
+    # laid out like a trainer checkpoint, the ema weights under an "ema_model." prefix
+    ema_state_dict = {f"ema_model.{name}": tensor for name, tensor in tiny_cfm.state_dict().items()}
+    ema_state_dict["initted"] = torch.tensor(True)
+    ema_state_dict["step"] = torch.tensor(10)
+    path = tmp_path / "model_10.pt"
+    torch.save({"ema_model_state_dict": ema_state_dict}, path)
+    return str(path)
+
+
+def test_int8_pack_round_trip(tiny_cfm, training_ckpt, tmp_path):
+    pack_path = pack_checkpoint(training_ckpt, str(tmp_path / "pack.safetensors"), dtype="int8")
+    metadata = read_pack_metadata(pack_path)
+    assert metadata["dtype"] == "int8" and metadata["model_cls"] == "DiT"
+
+    state_dict, _ = load_inference_state_dict(pack_path)
+    original = tiny_cfm.state_dict()
+    assert state_dict.keys() == original.keys()
+    for name, tensor in original.items():
+        packed = state_dict[name]
+        assert packed.dtype == tensor.dtype and packed.shape == tensor.shape
+        if tensor.ndim == 2 and name.endswith(".weight"):
+            # rounding to a 1/127 step of each row's largest magnitude
+            step = tensor.abs().amax(dim=1, keepdim=True) / 127
+            assert ((packed - tensor).abs() <= step / 2 + 1e-6).all()
+        else:
+            torch.testing.assert_close(packed, tensor, atol=0, rtol=0)
+
+    model = load_checkpoint(copy.deepcopy(tiny_cfm), pack_path, "cpu")
+    for name, tensor in model.state_dict().items():
+        torch.testing.assert_close(tensor, state_dict[name], atol=0, rtol=0)
+
+
+def test_float32_pack_is_exact(tiny_cfm, training_ckpt, tmp_path):
+    pack_path = pack_checkpoint(training_ckpt, str(tmp_path / "pack.safetensors"))
+    state_dict, _ = load_inference_state_dict(pack_path)
+    for name, tensor in tiny_cfm.state_dict().items():
+        torch.testing.assert_close(state_dict[name], tensor, atol=0, rtol=0)
+
+    with pytest.raises(ValueError, match="already an inference pack"):
+        pack_checkpoint(pack_path, str(tmp_path / "again.safetensors"))
@@ -0,0 +1,102 @@
+import numpy as np
+import torch
+
+from f5_tts.infer.snippet_cache import SnippetCache
+from f5_tts.infer.utils_infer import edit_contexts
+from f5_tts.infer.utils_infer import edit_process
+from f5_tts.infer.utils_infer import edit_windows
+from f5_tts.infer.utils_infer import locate_edit_parts
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+def test_hits_and_lru_eviction():
+    cache = SnippetCache(max_bytes=3 * 400)  # three 100-sample float32 waves
+    voice = SnippetCache.voice_hash(np.zeros(10))
+    keys = [SnippetCache.key(voice, ("", name, ""), 0, 10, 12, nfe_step=2) for name in ("ann", "bob", "cy", "dee")]
+    for value, key in enumerate(keys[:3]):
+        cache.put(key, np.full(100, value))
+    assert cache.get(keys[0])[0] == 0  # ann is now the most recently used
+    cache.put(keys[3], np.full(100, 3))
+
+    assert cache.get(keys[1]) is None
+    assert [cache.get(key)[0] for key in (keys[0], keys[2], keys[3])] == [0, 2, 3]
+    stats = cache.stats()
+    assert (stats["snippets"], stats["bytes"], stats["evictions"]) == (3, 1200, 1)
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+
+
+def test_keys_separate_voices_contexts_and_settings():
+    voices = [SnippetCache.voice_hash(np.zeros(10)), SnippetCache.voice_hash(np.ones(10))]
+    key = SnippetCache.key(voices[0], ("hi", "ann", "welcome"), 0, 10, 12, nfe_step=2, cfg_strength=2.0)
+    assert key == SnippetCache.key(voices[0], ("hi", "ann", "welcome"), 0, 10, 12, cfg_strength=2.0, nfe_step=2)
+    assert key != SnippetCache.key(voices[1], ("hi", "ann", "welcome"), 0, 10, 12, nfe_step=2, cfg_strength=2.0)
+    assert key != SnippetCache.key(voices[0], ("hi", "ann", "there"), 0, 10, 12, nfe_step=2, cfg_strength=2.0)
+    assert key != SnippetCache.key(voices[0], ("hi", "ann", "welcome"), 0, 10, 12, nfe_step=4, cfg_strength=2.0)
+
+
+def test_repeated_edit_is_spliced_from_the_cache(tiny_cfm, vocoder, monkeypatch):
+    torch.manual_seed(8)
+    source = 0.1 * torch.randn(6 * target_sample_rate)
+    word_times = [(f"w{i}", i * 0.5 + 0.05, i * 0.5 + 0.4) for i in range(12)]
+    ref_text = " ".join(word for word, _, _ in word_times)
+    gen_text = ref_text.replace("w5", "dana")
+    ref_audio = (source, target_sample_rate)
+    parts = locate_edit_parts(ref_audio, ref_text, gen_text, word_times=word_times)
+    windows = edit_windows(word_times, gen_text, parts, max_duration=tiny_cfm.max_duration)
+    contexts = edit_contexts([word for word, _, _ in word_times], gen_text)
+
+    calls = []
+    sample = tiny_cfm.sample
+    monkeypatch.setattr(tiny_cfm, "sample", lambda *args, **kwargs: calls.append(1) or sample(*args, **kwargs))
+    cache = SnippetCache()
+    waves = [
+        edit_process(
+            ref_audio,
+            gen_text,
+            parts,
+            tiny_cfm,
+            show_info=lambda *args: None,
+            nfe_step=2,
+            snippet_cache=cache,
+            contexts=contexts,
+            windows=windows,
+            vocoder=vocoder,
+            device="cpu",
+        )[0]
+        for _ in range(2)
+    ]
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+    np.testing.assert_array_equal(waves[0], waves[1])
+
+
+def test_seeded_edit_only_reuses_snippets_of_its_seed(tiny_cfm, vocoder, monkeypatch):
+    torch.manual_seed(8)
+    source = 0.1 * torch.randn(6 * target_sample_rate)
+    word_times = [(f"w{i}", i * 0.5 + 0.05, i * 0.5 + 0.4) for i in range(12)]
+    ref_text = " ".join(word for word, _, _ in word_times)
+    gen_text = ref_text.replace("w5", "dana")
+    ref_audio = (source, target_sample_rate)
+    parts = locate_edit_parts(ref_audio, ref_text, gen_text, word_times=word_times)
+    contexts = edit_contexts([word for word, _, _ in word_times], gen_text)
+
+    calls = []
+    sample = tiny_cfm.sample
+    monkeypatch.setattr(tiny_cfm, "sample", lambda *args, **kwargs: calls.append(1) or sample(*args, **kwargs))
+    cache = SnippetCache()
+    for seed in (None, 1, 2, 1):
+        edit_process(
+            ref_audio,
+            gen_text,
+            parts,
+            tiny_cfm,
+            show_info=lambda *args: None,
+            nfe_step=2,
+            snippet_cache=cache,
+            contexts=contexts,
+            seed=seed,
+            vocoder=vocoder,
+            device="cpu",
+        )
+    assert len(calls) == 3
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 3)
@@ -0,0 +1,12 @@
+import pytest
+import torch
+
+from f5_tts.infer.utils_infer import infer_stream_process
+from f5_tts.infer.utils_infer import target_sample_rate
+
+
+@pytest.mark.parametrize("gen_text", ["", "  \n "])
+def test_empty_text_raises(tiny_cfm, vocoder, gen_text):
+    ref_audio = (0.1 * torch.randn(1, target_sample_rate), target_sample_rate)
+    with pytest.raises(ValueError, match="empty"):
+        next(infer_stream_process(ref_audio, "a reference line.", gen_text, tiny_cfm, vocoder=vocoder, device="cpu"))
@@ -0,0 +1,16 @@
+import torch
+
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import vocode_batch
+
+
+def test_batched_tails_match_per_item(vocoder):
+    torch.manual_seed(5)
+    mel_specs = [torch.randn(100, length) for length in (37, 120, 64)]
+    batched = vocode_batch(mel_specs, vocoder)
+    for mel_spec, wave in zip(mel_specs, batched):
+        (alone,) = vocode_batch([mel_spec], vocoder)
+        assert wave.shape == alone.shape == (mel_spec.shape[-1] * hop_length,)
+        # the last frames are the ones padding could reach
+        torch.testing.assert_close(wave[-8 * hop_length :], alone[-8 * hop_length :])
+        torch.testing.assert_close(wave, alone)
@@ -1,7 +1,10 @@
 import subprocess
 import os
+import re
 import imageio_ffmpeg as ffmpeg
-from moviepy import *
+import librosa
+import numpy as np
+from typing import Dict, Optional, Tuple
 import logging
 import warnings
 
@@ -23,6 +26,7 @@ class AudioExtractor:
         self.input_video = input_video
         self.output_audio = self._validate_audio_extension(output_audio)
         self.ffmpeg_path = ffmpeg.get_ffmpeg_exe()
+        self._duration = None
 
     def _validate_audio_extension(self, output_audio: str) -> str:
         if not output_audio.endswith(".wav"):
@@ -66,10 +70,122 @@ class AudioExtractor:
             logging.error(f"Error during audio extraction: {e}")
             raise RuntimeError("Audio extraction failed") from e
 
+    def decode_audio(
+        self, sample_rates: Tuple[int, ...] = (16000, 24000)
+    ) -> Dict[int, np.ndarray]:
+        """
+        Decode the audio track straight into memory as mono float32 arrays.
+
+        FFmpeg decodes once at the highest requested rate and pipes raw ``f32le``
+        samples to stdout, lower rates are resampled from that buffer, so nothing is
+        written to or re-read from disk.
+
+        Parameters:
+        -----------
+        sample_rates : Tuple[int, ...]
+            Sample rates to return, e.g. 16 kHz for Whisper and 24 kHz for F5-TTS.
+
+        Returns:
+        --------
+        Dict[int, np.ndarray]
+            Mono samples keyed by sample rate.
+        """
+        decode_rate = max(sample_rates)
+        command = [
+            self.ffmpeg_path,
+            "-i",
+            self.input_video,
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(decode_rate),
+            "-f",
+            "f32le",
+            "pipe:1",
+        ]
+        try:
+            logging.info(f"Decoding audio from: {self.input_video}")
+            result = subprocess.run(
+                command,
+                check=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Error during audio decoding: {e}")
+            raise RuntimeError("Audio decoding failed") from e
+
+        audio = np.frombuffer(result.stdout, dtype=np.float32).copy()  # writable
+        decoded = {
+            sample_rate: (
+                audio
+                if sample_rate == decode_rate
+                else librosa.resample(audio, orig_sr=decode_rate, target_sr=sample_rate)
+            )
+            for sample_rate in sample_rates
+        }
+        logging.info(
+            f"Audio decoded successfully: {len(audio) / decode_rate:.2f}s at "
+            f"{', '.join(str(sample_rate) for sample_rate in sample_rates)} Hz"
+        )
+        return decoded
+
+    def get_duration(self) -> float:
+        """
+        Read the duration of the input video from its container header.
+
+        The header is probed once, later calls (one per finalized variant) reuse it.
+
+        Returns:
+        --------
+        float
+            Duration in seconds.
+        """
+        if self._duration is not None:
+            return self._duration
+        # without an output ffmpeg only prints the input header, then exits with an error
+        result = subprocess.run(
+            [self.ffmpeg_path, "-i", self.input_video],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        match = re.search(r"Duration: (\d+):(\d+):(\d+\.\d+)", result.stderr)
+        if match is None:
+            logging.error(f"Could not read the duration of {self.input_video}")
+            raise RuntimeError("Reading the video duration failed")
+        hours, minutes, seconds = match.groups()
+        self._duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        return self._duration
 
     def replace_audio(self, new_audio: str, output_video: str):
         """
-        Replaces the audio in a video file and adds a thumbnail.
+        Replaces the audio in a video file.
+
+        The video stream is copied as is and only the new audio is encoded, padded
+        with silence or cut so the output keeps the length of the video.
+
+        Parameters:
+        -----------
+        new_audio : str
+            Path to the new audio file.
+        output_video : str
+            Path to the output video file.
+        """
+        self.finalize_variant(new_audio, output_video)
+
+    def finalize_variant(
+        self, new_audio: str, output_video: str, thumbnail: Optional[bytes] = None
+    ):
+        """
+        Writes the final video of a variant in a single FFmpeg pass.
+
+        The new audio replaces the original track as in ``replace_audio``, and the
+        thumbnail, if given, is piped in through stdin and embedded as attached
+        picture, so the output video is the only file written.
 
         Parameters:
         -----------
@@ -77,20 +193,45 @@ class AudioExtractor:
             Path to the new audio file.
         output_video : str
             Path to the output video file.
-        thumbnail_text : str
-            Text to include in the thumbnail.
+        thumbnail : Optional[bytes]
+            PNG-encoded thumbnail, see ``thumbnail_generator.render_thumbnail``.
         """
         if not os.path.exists(self.input_video) or not os.path.exists(new_audio):
             logging.error("Input video or new audio file does not exist.")
             return
 
-        # Replace audio
-        video = VideoFileClip(self.input_video)
-        audio = AudioFileClip(new_audio)
-        video = video.with_audio(audio)
-        video.write_videofile(output_video)
-        logging.info(f"Audio replaced successfully in {output_video}")
-        
+        command = [self.ffmpeg_path, "-y", "-i", self.input_video, "-i", new_audio]
+        if thumbnail is not None:
+            command += ["-f", "png_pipe", "-i", "pipe:0"]
+        command += ["-map", "0:v:0", "-map", "1:a:0"]
+        if thumbnail is not None:
+            command += ["-map", "2:v:0", "-disposition:v:1", "attached_pic"]
+        # -shortest does not stop stream-copied video, so cut at the probed length
+        command += [
+            "-c:v",
+            "copy",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "192k",
+            "-af",
+            "apad",
+            "-t",
+            f"{self.get_duration():.3f}",
+            output_video,
+        ]
+        try:
+            subprocess.run(
+                command,
+                check=True,
+                input=thumbnail if thumbnail is not None else b"",
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            logging.info(f"Audio replaced successfully in {output_video}")
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Error during audio replacement: {e}")
+            raise RuntimeError("Audio replacement failed") from e
 
 
 # # Example usage
@@ -1,8 +1,9 @@
 import torch
 import librosa
 import logging
+import numpy as np
 from transformers import AutoProcessor, WhisperForConditionalGeneration
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
 import torch.nn.functional as F
 
 # Configure logging
@@ -12,6 +13,13 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()],
 )
 
+WORD_DTYPE = [
+    ("word", object),
+    ("start", np.float32),
+    ("end", np.float32),
+    ("confidence", np.float32),
+]
+
 
 class AudioTranscriber:
     def __init__(
@@ -19,20 +27,64 @@ class AudioTranscriber:
         language: str = "en",
         model_name: str = "openai/whisper-small",
         device: str = "cpu",
+        chunk_length_s: float = 30.0,
+        chunk_overlap_s: float = 5.0,
+        batch_size: int = 8,
+        backend: str = "hf",
+        compute_type: str = "int8",
+        vad_filter: bool = True,
     ):
-        """Initialize the transcriber with the model and processor."""
+        """
+        Initialize the transcriber with the model and processor.
+
+        Audio longer than ``chunk_length_s`` is split into windows overlapping by
+        ``chunk_overlap_s`` seconds, which are transcribed ``batch_size`` at a time.
+
+        With ``backend="ctranslate2"`` the model runs through faster-whisper instead of
+        transformers, quantized to ``compute_type`` (e.g. "int8" or "int8_float32" on
+        CPU). That backend does its own long-form decoding and, with ``vad_filter``,
+        skips non-speech before decoding.
+        """
+        if backend not in ("hf", "ctranslate2"):
+            raise ValueError(f"Unsupported transcription backend: {backend}")
+
         self.language = language
         self.device = device
-        self.processor = AutoProcessor.from_pretrained(model_name)
-        self.model = WhisperForConditionalGeneration.from_pretrained(model_name).to(
-            device
-        )
+        self.backend = backend
+        self.vad_filter = vad_filter
+        self.chunk_length_s = chunk_length_s
+        self.chunk_overlap_s = chunk_overlap_s
+        self.batch_size = batch_size
+        if backend == "ctranslate2":
+            from faster_whisper import WhisperModel
+
+            # faster-whisper names converted checkpoints by size ("small", "large-v3")
+            model_size = model_name.removeprefix("openai/whisper-")
+            self.processor = None
+            self.model = WhisperModel(
+                model_size, device=device.split(":")[0], compute_type=compute_type
+            )
+        else:
+            self.processor = AutoProcessor.from_pretrained(model_name)
+            self.model = WhisperForConditionalGeneration.from_pretrained(model_name).to(
+                device
+            )
         logging.info(
-            f"Initialized AudioTranscriber with model: {model_name} on device: {device}"
+            f"Initialized AudioTranscriber with model: {model_name} on device: {device} "
+            f"({backend} backend)"
         )
 
-    def load_audio(self, file_path: str, sample_rate: int = 16000) -> torch.Tensor:
-        """Load and resample the audio file to the specified sample rate."""
+    def load_audio(
+        self, file_path: Union[str, np.ndarray], sample_rate: int = 16000
+    ) -> torch.Tensor:
+        """
+        Load and resample the audio file to the specified sample rate.
+
+        Samples already decoded in memory at ``sample_rate`` (see
+        ``AudioExtractor.decode_audio``) are used as they are.
+        """
+        if isinstance(file_path, np.ndarray):
+            return torch.from_numpy(file_path)
         try:
             audio, _ = librosa.load(file_path, sr=sample_rate)
             logging.info(
@@ -43,10 +95,33 @@ class AudioTranscriber:
             logging.error(f"Error loading audio file {file_path}: {str(e)}")
             raise
 
-    def preprocess_audio(
+    def split_audio(
         self, audio: torch.Tensor, sample_rate: int = 16000
+    ) -> List[Tuple[float, np.ndarray]]:
+        """
+        Split audio into overlapping windows that each fit Whisper's 30 s input.
+
+        Returns:
+            List[Tuple[float, np.ndarray]]: (offset in seconds, samples) per window.
+        """
+        window = int(self.chunk_length_s * sample_rate)
+        stride = int((self.chunk_length_s - self.chunk_overlap_s) * sample_rate)
+        audio = np.asarray(audio)
+        windows = []
+        start = 0
+        while True:
+            windows.append((start / sample_rate, audio[start : start + window]))
+            if start + window >= len(audio):
+                break
+            start += stride
+        return windows
+
+    def preprocess_audio(
+        self,
+        audio: Union[torch.Tensor, List[np.ndarray]],
+        sample_rate: int = 16000,
     ) -> Dict[str, torch.Tensor]:
-        """Preprocess the audio for input to the Whisper model."""
+        """Preprocess the audio (a clip or a batch of windows) for input to the Whisper model."""
         try:
             inputs = self.processor(
                 audio,
@@ -90,18 +165,298 @@ class AudioTranscriber:
             logging.error("Error during transcription: %s", str(e))
             raise
 
-    def transcribe_file(self, file_path: str) -> str:
-        """Load, preprocess, and transcribe a single audio file."""
+    def transcribe_long(self, audio: torch.Tensor) -> str:
+        """
+        Transcribe audio longer than one window in padded batches and stitch the text.
+
+        Each window is decoded into timestamped segments, which are shifted by the
+        window offset and merged so every stretch of audio is read from one window only.
+        """
+        try:
+            segments = self._transcribe_windows(audio, self._decode_segments)
+            logging.info("Long-form transcription completed successfully.")
+            return " ".join(text for _, _, text in segments if text)
+        except Exception as e:
+            logging.error("Error during long-form transcription: %s", str(e))
+            raise
+
+    def _decode_segments(self, windows: List[Tuple[float, np.ndarray]]) -> List[list]:
+        """Decode windows in padded batches into (start, end, text) segments, in absolute seconds."""
+        language_kwargs = {} if self.language == "" else {"language": self.language}
+        window_segments = []
+        for i in range(0, len(windows), self.batch_size):
+            batch = windows[i : i + self.batch_size]
+            inputs = self.preprocess_audio([samples for _, samples in batch])
+            generated_ids = self.model.generate(
+                **inputs, **language_kwargs, return_timestamps=True
+            )
+            for (offset, _), ids in zip(batch, generated_ids):
+                decoded = self.processor.tokenizer.decode(ids, output_offsets=True)
+                window_segments.append(
+                    [
+                        (
+                            offset + segment["timestamp"][0],
+                            offset + segment["timestamp"][1],
+                            segment["text"].strip(),
+                        )
+                        for segment in decoded["offsets"]
+                    ]
+                )
+        return window_segments
+
+    def transcribe_file(self, file_path: Union[str, np.ndarray]) -> str:
+        """Load, preprocess, and transcribe an audio file, or 16 kHz samples, of any length."""
+        name = file_path if isinstance(file_path, str) else "in-memory audio"
         try:
             audio = self.load_audio(file_path)
-            inputs = self.preprocess_audio(audio)
-            transcription = self.transcribe_audio(inputs)
-            logging.info(f"Transcription for file {file_path} completed successfully.")
-            return transcription[0]
+            if self.backend == "ctranslate2":
+                segments = self._transcribe_ctranslate2(audio)
+                transcription = " ".join(segment.text.strip() for segment in segments)
+                logging.info(f"Transcription for {name} completed successfully.")
+                return transcription
+
+            if len(audio) > self.chunk_length_s * 16000:
+                transcription = self.transcribe_long(audio)
+            else:
+                inputs = self.preprocess_audio(audio)
+                transcription = self.transcribe_audio(inputs)[0]
+            logging.info(f"Transcription for {name} completed successfully.")
+            return transcription
         except Exception as e:
-            logging.error(f"Failed to transcribe file {file_path}: {str(e)}")
+            logging.error(f"Failed to transcribe {name}: {str(e)}")
             raise
 
+    def transcribe_words(self, file_path: Union[str, np.ndarray]) -> np.ndarray:
+        """
+        Load, preprocess, and transcribe an audio file, or 16 kHz samples, into timed words.
+
+        Word timings come from Whisper's cross-attention alignment of the generated tokens,
+        so no second ASR pass is needed to locate words in the audio. Long audio is
+        transcribed in overlapping windows like ``transcribe_file``.
+
+        Returns:
+            np.ndarray: Structured array with fields word, start, end (seconds) and confidence
+            (mean token probability), one row per word.
+        """
+        name = file_path if isinstance(file_path, str) else "in-memory audio"
+        try:
+            audio = self.load_audio(file_path)
+            if self.backend == "ctranslate2":
+                segments = self._transcribe_ctranslate2(audio, word_timestamps=True)
+                words = np.array(
+                    [
+                        (word.word.strip(), word.start, word.end, word.probability)
+                        for segment in segments
+                        for word in segment.words
+                        if word.word.strip()
+                    ],
+                    dtype=WORD_DTYPE,
+                )
+                logging.info(f"Word timings for {name} completed successfully.")
+                return words
+
+            words = np.array(
+                self._transcribe_windows(audio, self._decode_words), dtype=WORD_DTYPE
+            )
+            logging.info(f"Word timings for {name} completed successfully.")
+            return words
+        except Exception as e:
+            logging.error(f"Failed to transcribe words of {name}: {str(e)}")
+            raise
+
+    def _decode_words(self, windows: List[Tuple[float, np.ndarray]]) -> List[list]:
+        """Decode windows in padded batches into timed words, in absolute seconds."""
+        language_kwargs = {} if self.language == "" else {"language": self.language}
+        window_words = []
+        for i in range(0, len(windows), self.batch_size):
+            batch = windows[i : i + self.batch_size]
+            inputs = self.preprocess_audio([samples for _, samples in batch])
+            outputs = self.model.generate(
+                **inputs,
+                **language_kwargs,
+                return_timestamps=True,
+                return_token_timestamps=True,
+                return_dict_in_generate=True,
+                output_scores=True,
+            )
+            for index, (offset, _) in enumerate(batch):
+                group = self._group_words(
+                    outputs.sequences[index],
+                    outputs.token_timestamps[index],
+                    outputs.scores,
+                    batch_index=index,
+                )
+                group["start"] += offset
+                group["end"] += offset
+                window_words.append(list(group))
+        return window_words
+
+    def _transcribe_windows(
+        self, audio: torch.Tensor, decode, sample_rate: int = 16000, max_rounds: int = 3
+    ) -> List[tuple]:
+        """
+        Decode audio window by window with ``decode`` and stitch the items.
+
+        The fixed windows are decoded in batches first. Where a window had to drop an
+        item cut off by its edge before the next window begins, the speech in between
+        is in no window, so another window is decoded from the end of the last kept
+        item and takes over from there.
+        """
+        windows = self.split_audio(audio, sample_rate)
+        merged, gaps = self._stitch_windows(
+            decode(windows), [offset for offset, _ in windows]
+        )
+        audio = np.asarray(audio)
+        window = int(self.chunk_length_s * sample_rate)
+        for _ in range(max_rounds):
+            if not gaps:
+                break
+            gap_windows = [
+                (gap, audio[int(gap * sample_rate) : int(gap * sample_rate) + window])
+                for gap in gaps
+            ]
+            logging.info(
+                f"Decoding {len(gaps)} windows over speech cut off at window edges"
+            )
+            merged, gaps = self._fill_gaps(merged, gaps, decode(gap_windows))
+        return merged
+
+    def _transcribe_ctranslate2(
+        self, audio: torch.Tensor, word_timestamps: bool = False
+    ) -> list:
+        """Decode 16 kHz audio with the faster-whisper model into its segments."""
+        segments, _ = self.model.transcribe(
+            audio.numpy(),
+            language=self.language.split("-")[0] or None,
+            vad_filter=self.vad_filter,
+            word_timestamps=word_timestamps,
+        )
+        # segments are decoded lazily while iterating
+        return list(segments)
+
+    def _group_words(
+        self,
+        sequence: torch.Tensor,
+        token_timestamps: torch.Tensor,
+        scores: tuple,
+        batch_index: int = 0,
+    ) -> np.ndarray:
+        """Group generated tokens into space-delimited words with timings and confidence."""
+        tokenizer = self.processor.tokenizer
+        timestamp_begin = tokenizer.convert_tokens_to_ids("<|0.00|>")
+        special_ids = set(tokenizer.all_special_ids)
+        # scores only cover generated tokens
+        prompt_length = len(sequence) - len(scores)
+
+        # positions of text tokens, a leading-space token starts a new word
+        groups = []
+        for position, token_id in enumerate(sequence.tolist()):
+            if token_id in special_ids or token_id >= timestamp_begin:
+                continue
+            if not groups or tokenizer.convert_ids_to_tokens(token_id).startswith("Ġ"):
+                groups.append([])
+            groups[-1].append(position)
+
+        words = []
+        step_scores = [step[batch_index] for step in scores]
+        for positions in groups:
+            token_ids = sequence[positions].tolist()
+            word = tokenizer.decode(token_ids).strip()
+            if not word:
+                continue
+            end_position = min(positions[-1] + 1, len(token_timestamps) - 1)
+            confidence = np.mean(
+                [
+                    step_scores[position - prompt_length].softmax(-1)[token_id].item()
+                    for position, token_id in zip(positions, token_ids)
+                    if position >= prompt_length
+                ]
+                or [1.0]
+            )
+            words.append(
+                (
+                    word,
+                    token_timestamps[positions[0]].item(),
+                    token_timestamps[end_position].item(),
+                    confidence,
+                )
+            )
+
+        return np.array(words, dtype=WORD_DTYPE)
+
+    def _stitch_windows(
+        self, window_items: List[List[tuple]], offsets: List[float]
+    ) -> Tuple[List[tuple], List[float]]:
+        """
+        Merge per-window (start, end, ...) items, already in absolute seconds.
+
+        A window hands over to the next one at the middle of their overlap, and drops
+        items touching its right edge since those are cut off mid-speech. The next window
+        resumes after the last kept item, judged by item midpoints so that timestamps
+        drifting slightly between windows neither duplicate nor lose text.
+
+        Returns:
+            Tuple[List[tuple], List[float]]: The merged items, and the gaps: the end of the
+            last kept item wherever a dropped item began before the next window, so the
+            speech from there on was not read whole by any window.
+        """
+        merged, gaps = [], []
+        last_end = float("-inf")
+        for i, items in enumerate(window_items):
+            is_last = i == len(window_items) - 1
+            if not is_last:
+                handover = offsets[i + 1] + self.chunk_overlap_s / 2
+                window_end = offsets[i] + self.chunk_length_s - 0.1
+            for item in items:
+                start, end = float(item[0]), float(item[1])
+                if (start + end) / 2 < last_end:
+                    continue
+                if not is_last and (start >= handover or end >= window_end):
+                    gap = max(last_end, offsets[i])
+                    if start < offsets[i + 1] and gap not in gaps:
+                        gaps.append(gap)
+                    break
+                merged.append(item)
+                last_end = end
+        return merged, gaps
+
+    def _fill_gaps(
+        self, merged: List[tuple], gaps: List[float], gap_items: List[List[tuple]]
+    ) -> Tuple[List[tuple], List[float]]:
+        """
+        Splice the items of windows decoded from each gap into the merged items.
+
+        A gap window's whole items replace what the fixed windows read from the gap on,
+        up to its last kept item, after which the merged items resume. An item cut off by
+        the gap window's own edge leaves a gap for the next round, unless the resumed
+        items already read it from its start.
+        """
+
+        def midpoint(item):
+            return (float(item[0]) + float(item[1])) / 2
+
+        # from the last gap back, so each gap resumes onto items already filled in
+        new_gaps = []
+        for gap, items in reversed(list(zip(gaps, gap_items))):
+            window_end = gap + self.chunk_length_s - 0.1
+            kept, last_end, cut_start = [], gap, None
+            for item in items:
+                start, end = float(item[0]), float(item[1])
+                if (start + end) / 2 < gap:
+                    continue
+                if end >= window_end:
+                    cut_start = start
+                    break
+                kept.append(item)
+                last_end = end
+            resumed = [item for item in merged if midpoint(item) >= last_end]
+            if cut_start is not None and (
+                not resumed or float(resumed[0][0]) > cut_start + 1.0
+            ):
+                new_gaps.append(last_end)
+            merged = [item for item in merged if midpoint(item) < gap] + kept + resumed
+        return merged, sorted(new_gaps)
+
 
 # def transcribe_directory(audio_directory: str, transcriber: AudioTranscriber) -> str:
 #     """Process all audio files in a directory and print transcriptions."""
@@ -1,9 +1,9 @@
 import re
 import logging
+from artifact_cache import ArtifactCache
 from audio_extractor import AudioExtractor
-from audio_transcriber import AudioTranscriber
-from audio_cloner.src.f5_tts.api import F5TTS
-from transcription_processor import TranscriptionProcessor
+from model_worker import ModelClient
+from pipeline import Pipeline, Stage
 
 # Configure logging
 logging.basicConfig(
@@ -17,55 +17,97 @@ def run(
     input_video: str,
     output_audio: str,
     input_dict: dict,
-    transcriber: AudioTranscriber,
-    cloner: F5TTS,
+    client: ModelClient,
+    partial: bool = False,
+    synthesis_workers: int = 4,
+    mux_workers: int = 2,
 ) -> None:
     """
-    Main function to extract audio from a video file and transcribe it.
+    Main function to transcribe a video file and revoice it for every replacement.
+
+    The steps run as a pipeline: while one variant is muxed by FFmpeg the worker is
+    already synthesizing the next ones, and concurrent synthesis requests are batched
+    together by the worker's scheduler.
+
+    Each variant is its own synthesis job with a single text: the worker extracts the
+    reference audio, samples, vocodes and writes the wav within that one call, so
+    there are no separate extract and vocode stages here. The variants in flight at
+    once (``synthesis_workers``) are batched together by the worker's
+    ``BatchScheduler``.
 
     Args:
         input_video (str): Path to the input video file.
-        output_audio (str): Path to save the extracted audio file.
-        transcriber (AudioTranscriber): An instance of the AudioTranscriber class for transcription.
+        output_audio (str): Path for the extracted audio file (the audio itself is decoded in memory).
+        input_dict (dict): Words to replace and their replacements, one per variant.
+        client (ModelClient): Client of the model worker that holds the transcription, cloning and text models.
+        partial (bool): Only resynthesize the replaced words and keep the rest of the original audio.
+        synthesis_workers (int): Variants requested from the worker at the same time.
+        mux_workers (int): Variants muxed into the video at the same time.
     """
     try:
-        # Step 1: Extract audio from the video
         extractor = AudioExtractor(input_video, output_audio)
-        output_audio = extractor.extract_audio()
-
-        if output_audio:
-            logging.info(f"Audio extraction complete -----> Transcription Starting...")
-            # Step 2: Transcribe the extracted audio
-            transcription = transcriber.transcribe_file(output_audio)
-            print(transcription)
-            clean_sentence = lambda s: re.sub(r"[^\w\s]", "", s).lower().split()
-            original_words = clean_sentence(transcription)
-            logging.info(f"Audio Transcription complete -----> Cloning Starting...")
+        clean_sentence = lambda s: re.sub(r"[^\w\s]", "", s).lower().split()
 
-            transcription_processor = TranscriptionProcessor(
-                transcription, input_dict, threshold=90
-            )
-            processed_transcription_list = (
-                transcription_processor.process_transcription()
-            )
+        # Step 1: Transcribe the video, the worker decodes its audio in memory
+        def transcribe(media):
+            logging.info("Transcription Starting...")
+            # Timed words locate the spans to edit, the transcription is their text
+            transcribed = client.transcribe(media, words=partial)
+            if not transcribed["transcription"]:
+                raise ValueError("Transcription is empty. Skipping cloning.")
+            print(transcribed["transcription"])
+            return transcribed
 
-            for processed_transcription in processed_transcription_list:
+        # Step 2: Expand the transcription into one variant per replacement
+        def variants(transcribed):
+            transcription = transcribed["transcription"]
+            logging.info(f"Audio Transcription complete -----> Cloning Starting...")
+            original_words = clean_sentence(transcription)
+            for processed_transcription in client.variants(
+                transcription, input_dict, threshold=90
+            ):
                 changed_words = clean_sentence(processed_transcription)
                 different_words = [w for w in changed_words if w not in original_words]
-                final_name = "_".join(different_words)
-
-                wav, sr, spect = cloner.infer(
-                    ref_file=output_audio,
-                    ref_text=transcription,
-                    gen_text=processed_transcription,
-                    file_wave=f"data/outputs/{final_name}.wav",
-                )
-                extractor.replace_audio(
-                    f"data/outputs/{final_name}.wav", f"data/outputs/{final_name}.mp4"
-                )
-            logging.info(f"Finally Done output Folder: data/outputs")
-        else:
-            logging.error("Audio extraction failed. Skipping transcription.")
+                yield transcribed, processed_transcription, "_".join(different_words)
+
+        # Step 3: Clone the voice for a variant, the worker vocodes and writes the wav.
+        # Partial mode infills only the replaced spans, everything else stays the original audio
+        def synthesize(variant):
+            transcribed, processed_transcription, final_name = variant
+            results = client.synthesize(
+                media=input_video,
+                ref_text=transcribed["transcription"],
+                gen_texts=[processed_transcription],
+                file_waves=[f"data/outputs/{final_name}.wav"],
+                word_times=transcribed["words"] if partial else None,
+            )
+            list(results)  # the worker streams one result once the wav is written
+            return final_name
+
+        # Step 4: Mux the new audio into the video, reusing the result of an identical earlier mux
+        cache = ArtifactCache()
+        video_hash = cache.hash_file(input_video)
+
+        def mux(final_name):
+            wav = f"data/outputs/{final_name}.wav"
+            mp4 = f"data/outputs/{final_name}.mp4"
+            cache_key = cache.key("video", video=video_hash, audio=cache.hash_file(wav))
+            if not cache.fetch(cache_key, ".mp4", mp4):
+                extractor.replace_audio(wav, mp4)
+                cache.put(cache_key, ".mp4", mp4)
+            return mp4
+
+        pipeline = Pipeline(
+            [
+                Stage("transcribe", transcribe),
+                Stage("variants", variants, fan_out=True),
+                Stage("synthesize", synthesize, workers=synthesis_workers),
+                Stage("mux", mux, workers=mux_workers),
+            ]
+        )
+        pipeline.run([input_video])
+        pipeline.log_utilization()
+        logging.info(f"Finally Done output Folder: data/outputs")
 
     except Exception as e:
         logging.error(f"Error in main workflow: {str(e)}")
@@ -87,9 +129,9 @@ if __name__ == "__main__":
     # language means it will translate the final transcription to provided language,
     # default is "english"(language="en") user can provide others as their short name eg. "en" for "english"
     # user can skip this using language=""
-    transcriber = AudioTranscriber(
+    # The worker keeps the models loaded between runs, it is started on first use
+    client = ModelClient.connect(device="cpu").load_transcriber(
         language="en", model_name="openai/whisper-small", device="cpu"
     )
-    cloner = F5TTS()
 
-    run(input_video, output_audio, input_dict, transcriber, cloner)
+    run(input_video, output_audio, input_dict, client)
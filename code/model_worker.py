@@ -0,0 +1,599 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from concurrent.futures import as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_URL = os.environ.get("MODEL_WORKER_URL", "http://127.0.0.1:8765")
+
+
+class ModelWorker:
+    """
+    Keeps the transcription, cloning and text models loaded across jobs.
+
+    Models are loaded on first use and cached by their settings, so switching the
+    language or Whisper variant loads a new model once instead of on every run. Jobs
+    touching the models run one at a time since they share the device, except full
+    synthesis: its requests go through the cloner's batch scheduler, which coalesces
+    concurrent jobs into shared padded batches of up to ``max_batch_frames`` mel
+    frames, waiting at most ``max_wait`` seconds for company.
+
+    Decoded audio, transcripts and generated variants are also kept in an
+    ``ArtifactCache`` under ``cache_dir``, keyed by the media's content hash and the
+    settings that produced them, so repeat jobs and retried variants skip the models.
+    """
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        audio_cache_size: int = 8,
+        max_batch_frames: int = 16384,
+        max_wait: float = 0.05,
+        nfe_step: int = 32,
+        cfg_strength: float = 2.0,
+        sway_sampling_coef: float = -1.0,
+        ckpt_file: str = "",
+        snippet_cache_bytes: int = 256 * 1024**2,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: Optional[int] = None,
+    ):
+        from code.artifact_cache import (
+            DEFAULT_CACHE_DIR,
+            DEFAULT_MAX_BYTES,
+            ArtifactCache,
+        )
+
+        self.device = device
+        self.audio_cache_size = audio_cache_size
+        self.max_batch_frames = max_batch_frames
+        self.max_wait = max_wait
+        self.nfe_step = nfe_step
+        self.cfg_strength = cfg_strength
+        self.sway_sampling_coef = sway_sampling_coef
+        self.ckpt_file = ckpt_file
+        self.snippet_cache_bytes = snippet_cache_bytes
+        self._lock = threading.Lock()
+        self._transcribers = {}
+        self._cloners = {}
+        self._schedulers = {}
+        self._punctuation_model = None
+        self._audio_cache = {}
+        self.cache = ArtifactCache(
+            cache_dir or DEFAULT_CACHE_DIR, cache_max_bytes or DEFAULT_MAX_BYTES
+        )
+
+    def transcriber(
+        self,
+        language: str = "en",
+        model_name: str = "openai/whisper-small",
+        device: Optional[str] = None,
+        backend: Optional[str] = None,
+    ):
+        """Return the cached AudioTranscriber for these settings, loading it if needed."""
+        from code.audio_transcriber import AudioTranscriber
+
+        device = device or self.device
+        # int8 CTranslate2 is much faster than fp32 transformers on CPU
+        backend = backend or ("ctranslate2" if device == "cpu" else "hf")
+        key = (language, model_name, device, backend)
+        if key not in self._transcribers:
+            self._transcribers[key] = AudioTranscriber(
+                language=language, model_name=model_name, device=device, backend=backend
+            )
+        return self._transcribers[key]
+
+    def cloner(self, device: Optional[str] = None):
+        """Return the cached F5TTS model for the device, loading it if needed."""
+        from code.audio_cloner.src.f5_tts.api import F5TTS
+
+        device = device or self.device
+        if device not in self._cloners:
+            cloner = F5TTS(model_type="F5-TTS", ckpt_file=self.ckpt_file, device=device)
+            # partial edits reuse names rendered before in the same voice and context
+            cloner.enable_snippet_cache(self.snippet_cache_bytes)
+            self._cloners[device] = cloner
+        return self._cloners[device]
+
+    def scheduler(self, device: Optional[str] = None):
+        """Return the batch scheduler in front of the device's F5TTS model."""
+        device = device or self.device
+        if device not in self._schedulers:
+            self._schedulers[device] = self.cloner(device).batch_scheduler(
+                max_batch_frames=self.max_batch_frames,
+                max_wait=self.max_wait,
+                nfe_step=self.nfe_step,
+                cfg_strength=self.cfg_strength,
+                sway_sampling_coef=self.sway_sampling_coef,
+            )
+        return self._schedulers[device]
+
+    def punctuation_model(self):
+        """Return the punctuation restoration model, loading it if needed."""
+        from deepmultilingualpunctuation import PunctuationModel
+
+        if self._punctuation_model is None:
+            self._punctuation_model = PunctuationModel(model="kredor/punctuate-all")
+        return self._punctuation_model
+
+    def decode(self, media: str) -> Dict[int, Any]:
+        """Decode a media file to 16 kHz and 24 kHz mono, cached by path and mtime."""
+        from code.audio_extractor import AudioExtractor
+
+        key = (os.path.abspath(media), os.path.getmtime(media))
+        if key not in self._audio_cache:
+            if len(self._audio_cache) >= self.audio_cache_size:
+                self._audio_cache.pop(next(iter(self._audio_cache)))
+            cache_key = self.cache.key(
+                "audio", media=self.cache.hash_file(media), sample_rates=[16000, 24000]
+            )
+            arrays = self.cache.get_arrays(cache_key)
+            if arrays is None:
+                audio = AudioExtractor(media, f"{media}.wav").decode_audio(
+                    sample_rates=(16000, 24000)
+                )
+                self.cache.put_arrays(
+                    cache_key, {str(rate): samples for rate, samples in audio.items()}
+                )
+            else:
+                audio = {int(rate): samples for rate, samples in arrays.items()}
+            self._audio_cache[key] = audio
+        return self._audio_cache[key]
+
+    # --- Jobs ---
+    def health(self) -> Dict[str, Any]:
+        import torch
+
+        return {
+            "status": "ok",
+            "cuda": torch.cuda.is_available(),
+            "cache": self.cache.stats(),
+            "snippets": {
+                device: cloner.snippet_cache.stats()
+                for device, cloner in self._cloners.items()
+            },
+        }
+
+    def load(self, **transcriber_settings) -> Dict[str, Any]:
+        """Warm up the transcriber for the given settings and the cloner."""
+        with self._lock:
+            self.transcriber(**transcriber_settings)
+            self.cloner(transcriber_settings.get("device"))
+        return {"status": "loaded"}
+
+    def transcribe(
+        self, media: str, words: bool = True, **transcriber_settings
+    ) -> Dict[str, Any]:
+        """Transcribe a media file, with timed words as [word, start, end, confidence]."""
+        cache_key = self.cache.key(
+            "transcript",
+            media=self.cache.hash_file(media),
+            words=words,
+            **transcriber_settings,
+        )
+        result = self.cache.get_json(cache_key)
+        if result is not None:
+            return result
+
+        with self._lock:
+            audio = self.decode(media)
+            transcriber = self.transcriber(**transcriber_settings)
+            if not words:
+                result = {"transcription": transcriber.transcribe_file(audio[16000])}
+            else:
+                word_times = transcriber.transcribe_words(audio[16000])
+                result = {
+                    "transcription": " ".join(word_times["word"]),
+                    "words": [
+                        [str(word), float(start), float(end), float(confidence)]
+                        for word, start, end, confidence in word_times
+                    ],
+                }
+        self.cache.put_json(cache_key, result)
+        return result
+
+    def process_text(self, text: str, language: str) -> Dict[str, List[str]]:
+        """Split a transcription into replaceable (noun-like) and other words."""
+        from code.text_processor import process_text
+
+        allowed_words, disallowed_words = process_text(text, language)
+        return {"allowed": allowed_words, "disallowed": disallowed_words}
+
+    def variants(
+        self, transcription: str, input_dict: Dict[str, List[str]], threshold: int = 90
+    ) -> Dict[str, List[str]]:
+        """Expand a transcription into punctuated variants with the given replacements."""
+        from code.transcription_processor import TranscriptionProcessor
+
+        with self._lock:
+            processor = TranscriptionProcessor(
+                self.punctuation_model(), transcription, input_dict, threshold=threshold
+            )
+            return {"variants": processor.process_transcription()}
+
+    def synthesize(
+        self,
+        media: str,
+        ref_text: str,
+        gen_texts: List[str],
+        file_waves: List[str],
+        word_times: Optional[List[list]] = None,
+        device: Optional[str] = None,
+        speed: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Clone the voice of a media file for every text, yielding each written file.
+
+        With ``word_times`` only the replaced words are resynthesized (see
+        ``F5TTS.edit``), otherwise all texts are submitted to the batch scheduler at
+        once, which pads them into shared batches with other jobs' texts. Without a
+        ``seed`` every render draws fresh noise, and any earlier unseeded render of the
+        same text and settings is reused.
+        """
+        # variants rendered before from the same audio, texts, model and settings are reused
+        media_hash = self.cache.hash_file(media)
+        model = ["F5-TTS", self.ckpt_file and self.cache.hash_file(self.ckpt_file)]
+        cache_keys = [
+            self.cache.key(
+                "variant",
+                media=media_hash,
+                ref_text=ref_text,
+                gen_text=gen_text,
+                word_times=word_times or None,
+                model=model,
+                nfe_step=self.nfe_step,
+                cfg_strength=self.cfg_strength,
+                sway_sampling_coef=self.sway_sampling_coef,
+                speed=speed,
+                seed=seed,
+            )
+            for gen_text in gen_texts
+        ]
+        pending = []
+        for index, (cache_key, file_wave) in enumerate(zip(cache_keys, file_waves)):
+            if self.cache.fetch(cache_key, ".wav", file_wave):
+                yield {"index": index, "file_wave": file_wave}
+            else:
+                pending.append(index)
+
+        if word_times:
+            with self._lock:
+                cloner = self.cloner(device)
+                ref_audio = (self.decode(media)[24000], 24000)
+            for index in pending:
+                # locked per edit and released before yielding, a slow reader of the
+                # stream must not hold up other jobs
+                with self._lock:
+                    cloner.edit(
+                        ref_file=ref_audio,
+                        original_text=ref_text,
+                        new_text=gen_texts[index],
+                        word_times=word_times,
+                        nfe_step=self.nfe_step,
+                        cfg_strength=self.cfg_strength,
+                        sway_sampling_coef=self.sway_sampling_coef,
+                        speed=speed,
+                        file_wave=file_waves[index],
+                        seed=-1 if seed is None else seed,
+                    )
+                self.cache.put(cache_keys[index], ".wav", file_waves[index])
+                yield {"index": index, "file_wave": file_waves[index]}
+            return
+
+        if not pending:
+            return
+        with self._lock:
+            cloner = self.cloner(device)
+            scheduler = self.scheduler(device)
+            ref_audio = (self.decode(media)[24000], 24000)
+        # no lock while sampling, the scheduler batches this job with concurrent ones
+        futures = {
+            scheduler.submit(
+                ref_audio, ref_text, gen_texts[index], speed=speed, seed=seed
+            ): index
+            for index in pending
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            wave, _, _ = future.result()
+            cloner.export_wav(wave, file_waves[index])
+            self.cache.put(cache_keys[index], ".wav", file_waves[index])
+            yield {"index": index, "file_wave": file_waves[index]}
+
+
+# jobs answered with one JSON object, and the one streaming a JSON line per result
+JOBS = ("health", "load", "transcribe", "process_text", "variants")
+STREAMING_JOBS = ("synthesize",)
+
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+    """Serves ``POST /<job>`` with JSON keyword arguments for ``ModelWorker`` jobs."""
+
+    worker: ModelWorker = None
+
+    def do_GET(self):
+        if self.path.strip("/") != "health":
+            self.send_error(404)
+            return
+        self._send_json(200, self.worker.health())
+
+    def do_POST(self):
+        job = self.path.strip("/")
+        if job not in JOBS + STREAMING_JOBS:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            kwargs = json.loads(self.rfile.read(length) or b"{}")
+            if job in JOBS:
+                self._send_json(200, getattr(self.worker, job)(**kwargs))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for result in getattr(self.worker, job)(**kwargs):
+                self.wfile.write(json.dumps(result).encode() + b"\n")
+                self.wfile.flush()
+        except Exception as e:
+            logging.error(f"Job {job} failed: {str(e)}")
+            if job in JOBS:
+                self._send_json(500, {"error": str(e)})
+            else:  # the status line is already sent, report it in the stream
+                self.wfile.write(json.dumps({"error": str(e)}).encode() + b"\n")
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    device: Optional[str] = None,
+    max_batch_frames: int = 16384,
+    max_wait: float = 0.05,
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: Optional[int] = None,
+    ckpt_file: str = "",
+) -> None:
+    """Run the model worker until interrupted, on the GPU by default if there is one."""
+    if device is None:
+        import torch
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    WorkerRequestHandler.worker = ModelWorker(
+        device=device,
+        ckpt_file=ckpt_file,
+        max_batch_frames=max_batch_frames,
+        max_wait=max_wait,
+        cache_dir=cache_dir,
+        cache_max_bytes=cache_max_bytes,
+    )
+    server = ThreadingHTTPServer((host, port), WorkerRequestHandler)
+    logging.info(f"Model worker listening on http://{host}:{port} ({device})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class WorkerError(RuntimeError):
+    """A job failed inside the model worker."""
+
+
+class ModelClient:
+    """
+    Thin client for the model worker, without importing any model code.
+
+    ``connect`` starts a worker in the background if none is listening yet, so the
+    first client pays the model loading once and every later run reuses it.
+    """
+
+    def __init__(self, url: str = DEFAULT_URL, **transcriber_settings):
+        self.url = url.rstrip("/")
+        self.transcriber_settings = transcriber_settings
+
+    @classmethod
+    def connect(
+        cls,
+        url: str = DEFAULT_URL,
+        spawn: bool = True,
+        device: Optional[str] = None,
+        startup_timeout: float = 120.0,
+    ) -> "ModelClient":
+        """
+        Connect to the worker at ``url``, starting one on its port if needed.
+
+        A started worker defaults to ``device`` (the GPU if available when None) for
+        jobs that do not name one.
+        """
+        client = cls(url)
+        if client.healthy():
+            return client
+        if not spawn:
+            raise ConnectionError(f"No model worker is listening on {url}")
+
+        host, port = url.split("//")[-1].rstrip("/").rsplit(":", 1)
+        logging.info(f"Starting model worker on {url}")
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "code.model_worker",
+                "--host",
+                host,
+                "--port",
+                port,
+            ]
+            + (["--device", device] if device else []),
+            cwd=ROOT_DIR,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + startup_timeout
+        while not client.healthy():
+            if time.monotonic() > deadline:
+                raise ConnectionError(f"Model worker did not start on {url}")
+            time.sleep(0.5)
+        return client
+
+    def healthy(self) -> bool:
+        try:
+            return self.health()["status"] == "ok"
+        except (OSError, ValueError):
+            return False
+
+    def _post(self, job: str, payload: Dict[str, Any], timeout: Optional[float] = None):
+        request = urllib.request.Request(
+            f"{self.url}/{job}",
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise WorkerError(json.loads(e.read() or b"{}").get("error", str(e))) from e
+
+    def _call(
+        self, job: str, timeout: Optional[float] = None, **payload
+    ) -> Dict[str, Any]:
+        with self._post(job, payload, timeout=timeout) as response:
+            return json.loads(response.read())
+
+    def health(self) -> Dict[str, Any]:
+        with urllib.request.urlopen(f"{self.url}/health", timeout=2) as response:
+            return json.loads(response.read())
+
+    def load_transcriber(self, **transcriber_settings) -> "ModelClient":
+        """Warm up the worker's models and use these settings for later transcriptions."""
+        self.transcriber_settings = transcriber_settings
+        self._call("load", **transcriber_settings)
+        return self
+
+    def transcribe(self, media: str, words: bool = True) -> Dict[str, Any]:
+        """Transcribe a media file, see ``ModelWorker.transcribe``. Paths are shared with the worker."""
+        return self._call(
+            "transcribe",
+            media=os.path.abspath(media),
+            words=words,
+            **self.transcriber_settings,
+        )
+
+    def process_text(self, text: str, language: str) -> Tuple[List[str], List[str]]:
+        """Return the replaceable and the other words of a transcription."""
+        result = self._call("process_text", text=text, language=language)
+        return result["allowed"], result["disallowed"]
+
+    def variants(
+        self, transcription: str, input_dict: Dict[str, List[str]], threshold: int = 90
+    ) -> List[str]:
+        """Expand a transcription into its punctuated variants."""
+        return self._call(
+            "variants",
+            transcription=transcription,
+            input_dict=input_dict,
+            threshold=threshold,
+        )["variants"]
+
+    def synthesize(
+        self,
+        media: str,
+        ref_text: str,
+        gen_texts: List[str],
+        file_waves: List[str],
+        word_times: Optional[List[list]] = None,
+        device: Optional[str] = None,
+        speed: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Clone the voice of a media file, yielding each result as it is written."""
+        payload = {
+            "media": os.path.abspath(media),
+            "ref_text": ref_text,
+            "gen_texts": gen_texts,
+            "file_waves": [os.path.abspath(file_wave) for file_wave in file_waves],
+            "word_times": word_times,
+            "device": device or self.transcriber_settings.get("device"),
+            "speed": speed,
+            "seed": seed,
+        }
+        with self._post("synthesize", payload) as response:
+            for line in response:
+                result = json.loads(line)
+                if "error" in result:
+                    raise WorkerError(result["error"])
+                yield result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the models to the app and CLI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--device", default=None, help="Default device (default: cuda if available)."
+    )
+    parser.add_argument(
+        "--max-batch-frames",
+        type=int,
+        default=16384,
+        help="Padded mel frames per batched sample call (batch size x longest).",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=0.05,
+        help="Seconds a request may wait for others to share its batch.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Artifact cache directory (default: $ARTIFACT_CACHE_DIR or .artifacts).",
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=None,
+        help="Size the artifact cache is trimmed to, least recently used first.",
+    )
+    parser.add_argument(
+        "--ckpt-file",
+        default="",
+        help="F5-TTS checkpoint or inference pack (default: the released model).",
+    )
+    args = parser.parse_args()
+    serve(
+        args.host,
+        args.port,
+        args.device,
+        args.max_batch_frames,
+        args.max_wait,
+        args.cache_dir,
+        int(args.cache_max_gb * 1024**3) if args.cache_max_gb else None,
+        args.ckpt_file,
+    )
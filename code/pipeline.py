@@ -0,0 +1,167 @@
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+
+# marks the end of a stage's input, passed on once every worker of the stage is done
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a ``Pipeline``, run by its own pool of worker threads.
+
+    Args:
+        name (str): Name used in logs and utilization reports.
+        fn (Callable): Called with each input item, returns the output item.
+        workers (int): Number of threads running ``fn`` concurrently.
+        queue_size (int): Capacity of the stage's input queue. A full queue blocks
+            the previous stage, so a slow stage holds back the ones feeding it.
+        fan_out (bool): ``fn`` returns an iterable and each element is passed on as
+            its own item, e.g. one transcription expanding into its variants.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: int = 4,
+        fan_out: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.fan_out = fan_out
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def utilization(self, wall_seconds: float) -> float:
+        """Fraction of the worker pool's time spent inside ``fn``."""
+        if wall_seconds <= 0:
+            return 0.0
+        return self.busy_seconds / (self.workers * wall_seconds)
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues.
+
+    Every stage works on its own threads, so a stage waiting on the model worker
+    (synthesis) overlaps with one waiting on FFmpeg (muxing) instead of taking turns.
+    Stages are expected to spend their time in subprocesses, sockets or native code
+    that release the GIL. A failing item is logged and dropped, the others go on.
+
+    Example:
+        pipeline = Pipeline([Stage("synthesize", synth, workers=4), Stage("mux", mux, workers=2)])
+        results = pipeline.run(texts)
+        pipeline.log_utilization()
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.wall_seconds = 0.0
+        self._results = queue.Queue()
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Feed ``items`` through every stage and return the outputs of the last one."""
+        start = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = (
+                self.stages[index + 1].inbox
+                if index + 1 < len(self.stages)
+                else self._results
+            )
+            stage._running = stage.workers
+            stage.items = stage.errors = 0
+            stage.busy_seconds = stage.blocked_seconds = 0.0
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, outbox),
+                    name=f"pipeline-{stage.name}-{number}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            self.stages[0].inbox.put(item)
+        self.stages[0].inbox.put(_DONE)
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - start
+
+        results = []
+        while True:
+            result = self._results.get()
+            if result is _DONE:
+                return results
+            results.append(result)
+
+    def _work(self, stage: Stage, outbox: queue.Queue):
+        while True:
+            item = stage.inbox.get()
+            if item is _DONE:
+                # pass it to the stage's other workers, the last one to stop tells the next stage
+                with stage._lock:
+                    stage._running -= 1
+                    last = stage._running == 0
+                (outbox if last else stage.inbox).put(_DONE)
+                return
+
+            started = time.perf_counter()
+            try:
+                outputs = stage.fn(item)
+                outputs = list(outputs) if stage.fan_out else [outputs]
+            except Exception as e:
+                logging.error(f"Stage {stage.name} failed: {str(e)}")
+                with stage._lock:
+                    stage.errors += 1
+                continue
+            finally:
+                with stage._lock:
+                    stage.busy_seconds += time.perf_counter() - started
+
+            blocked = time.perf_counter()
+            for output in outputs:
+                outbox.put(output)
+            with stage._lock:
+                stage.items += 1
+                stage.blocked_seconds += time.perf_counter() - blocked
+
+    def utilization(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: items done, failures, busy and backpressure seconds, utilization."""
+        return {
+            stage.name: {
+                "items": stage.items,
+                "errors": stage.errors,
+                "busy_seconds": round(stage.busy_seconds, 3),
+                "blocked_seconds": round(stage.blocked_seconds, 3),
+                "utilization": round(stage.utilization(self.wall_seconds), 3),
+            }
+            for stage in self.stages
+        }
+
+    def log_utilization(self):
+        """Log how busy every stage was during the last run."""
+        logging.info(f"Pipeline finished in {self.wall_seconds:.2f}s")
+        for name, stats in self.utilization().items():
+            logging.info(
+                f"  {name}: {stats['items']} items, {stats['errors']} failed, "
+                f"{stats['utilization']:.0%} busy, {stats['blocked_seconds']:.2f}s blocked"
+            )
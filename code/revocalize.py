@@ -0,0 +1,399 @@
+import os
+import re
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from code.artifact_cache import ArtifactCache
+from code.audio_extractor import AudioExtractor
+from code.model_worker import DEFAULT_URL, ModelClient
+from code.pipeline import Pipeline, Stage
+from code.thumbnail_generator import render_thumbnail
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+
+
+def personalize(transcription: str, replacements: Dict[str, str]) -> str:
+    """
+    Replace whole words of a transcription, keeping its punctuation and other words.
+
+    Args:
+        transcription (str): The template's transcription.
+        replacements (Dict[str, str]): Lowercase template words and what to say instead.
+            Empty replacements keep the original word.
+
+    Returns:
+        str: The personalized text.
+    """
+
+    def swap(match):
+        return replacements.get(match.group(0).lower()) or match.group(0)
+
+    return re.sub(r"\w+", swap, transcription)
+
+
+def slugify(text: str, max_length: int = 40) -> str:
+    return re.sub(r"[^\w]+", "_", text).strip("_").lower()[:max_length] or "variant"
+
+
+class BulkJob:
+    """
+    Personalizes a template video for every recipient of a CSV, resumably.
+
+    The CSV has one row per recipient. Every column named after a word of the template
+    replaces that word; the optional ``id_column`` names the output files and the
+    optional ``thumbnail_column`` is written on the video's thumbnail. The job lives
+    in ``job_dir``:
+
+    - ``manifest.json``: the template, its transcription, and every variant's id, text
+      and output path, written once so a resumed job does not transcribe again.
+    - ``ledger/shard-XXXXX.jsonl``: one line per finished variant, appended as soon as
+      its video is written. Variants found there are skipped on resume.
+    - ``videos/``: the personalized videos, named ``<row>_<id>.mp4`` so recipients
+      sharing a name do not overwrite each other.
+    - ``report.json``: throughput of the last run, per stage and overall.
+
+    Args:
+        template (str): Path to the template video.
+        recipients (str): Path to the recipients CSV.
+        job_dir (str): Directory holding the job's state and outputs.
+        client (ModelClient): Client of the model worker.
+        id_column (Optional[str]): Column naming each recipient's output files.
+        thumbnail_column (Optional[str]): Column written on each video's thumbnail.
+        shard_size (int): Variants per shard, a shard is the unit of work handed to
+            the pipeline and reported on.
+        synthesis_workers (int): Variants requested from the worker at the same time.
+        mux_workers (int): Variants muxed into the video at the same time.
+    """
+
+    def __init__(
+        self,
+        template: str,
+        recipients: str,
+        job_dir: str,
+        client: ModelClient,
+        id_column: Optional[str] = None,
+        thumbnail_column: Optional[str] = None,
+        shard_size: int = 100,
+        synthesis_workers: int = 4,
+        mux_workers: int = 2,
+    ):
+        self.template = template
+        self.recipients = recipients
+        self.job_dir = Path(job_dir)
+        self.client = client
+        self.id_column = id_column
+        self.thumbnail_column = thumbnail_column
+        self.shard_size = shard_size
+        self.synthesis_workers = synthesis_workers
+        self.mux_workers = mux_workers
+        self.cache = ArtifactCache()
+        self.extractor = AudioExtractor(template, str(self.job_dir / "template.wav"))
+        self.template_hash = None  # set by load_manifest
+        self._ledger_lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.job_dir / "manifest.json"
+
+    def ledger_path(self, shard: int) -> Path:
+        return self.job_dir / "ledger" / f"shard-{shard:05d}.jsonl"
+
+    # --- Manifest ---
+    def load_manifest(self) -> Dict[str, Any]:
+        """Read the job manifest, or transcribe the template and write it."""
+        template_hash = self.cache.hash_file(self.template)
+        recipients_hash = self.cache.hash_file(self.recipients)
+        # hashed once per job, every muxed variant is keyed by it
+        self.template_hash = template_hash
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if (manifest["template_hash"], manifest["recipients_hash"]) != (
+                template_hash,
+                recipients_hash,
+            ):
+                raise ValueError(
+                    f"{self.job_dir} belongs to another template or recipients file, "
+                    "use a new job directory"
+                )
+            logging.info(f"Resuming job from {self.manifest_path}")
+            return manifest
+
+        logging.info("Transcription Starting...")
+        transcription = self.client.transcribe(self.template, words=False)[
+            "transcription"
+        ]
+        if not transcription:
+            raise ValueError("Transcription is empty. Skipping cloning.")
+        template_words = set(re.findall(r"\w+", transcription.lower()))
+
+        with open(self.recipients, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            raise ValueError(f"No recipients in {self.recipients}")
+        columns = [
+            column for column in rows[0] if column.strip().lower() in template_words
+        ]
+        if not columns:
+            raise ValueError(
+                "No CSV column names a word of the template's transcription: "
+                f"{transcription}"
+            )
+        logging.info(f"Replacing {', '.join(columns)} for {len(rows)} recipients")
+
+        variants = []
+        for row_index, row in enumerate(rows):
+            replacements = {
+                column.strip().lower(): row[column].strip() for column in columns
+            }
+            label = (
+                row[self.id_column]
+                if self.id_column
+                else "_".join(value for value in replacements.values() if value)
+            )
+            name = f"{row_index:06d}_{slugify(label)}"
+            variants.append(
+                {
+                    "id": row_index,
+                    "shard": row_index // self.shard_size,
+                    "gen_text": personalize(transcription, replacements),
+                    "thumbnail": (
+                        row[self.thumbnail_column] if self.thumbnail_column else None
+                    ),
+                    "wav": str(self.job_dir / "audio" / f"{name}.wav"),
+                    "video": str(self.job_dir / "videos" / f"{name}.mp4"),
+                }
+            )
+
+        manifest = {
+            "template": os.path.abspath(self.template),
+            "template_hash": template_hash,
+            "recipients": os.path.abspath(self.recipients),
+            "recipients_hash": recipients_hash,
+            "transcription": transcription,
+            "columns": columns,
+            "shard_size": self.shard_size,
+            "shards": (len(variants) + self.shard_size - 1) // self.shard_size,
+            "variants": variants,
+        }
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+        return manifest
+
+    # --- Ledger ---
+    def completed(self, shard: int) -> Set[int]:
+        """Ids of the shard's variants whose video was written by an earlier run."""
+        done = set()
+        if not self.ledger_path(shard).exists():
+            return done
+        with open(self.ledger_path(shard), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:  # torn last line of a crashed run
+                    continue
+                if os.path.exists(entry["video"]):
+                    done.add(entry["id"])
+        return done
+
+    def record(self, variant: Dict[str, Any], seconds: float):
+        entry = {
+            "id": variant["id"],
+            "video": variant["video"],
+            "seconds": round(seconds, 3),
+            "finished_at": time.time(),
+        }
+        with self._ledger_lock:
+            with open(self.ledger_path(variant["shard"]), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    # --- Stages ---
+    def synthesize(self, variant: Dict[str, Any], transcription: str):
+        started = time.perf_counter()
+        results = self.client.synthesize(
+            media=self.template,
+            ref_text=transcription,
+            gen_texts=[variant["gen_text"]],
+            file_waves=[variant["wav"]],
+        )
+        list(results)  # the worker streams one result once the wav is written
+        return variant, started
+
+    def mux(self, item):
+        variant, started = item
+        # same video, audio and thumbnail as an earlier mux, e.g. a retried variant
+        cache_key = self.cache.key(
+            "video",
+            video=self.template_hash,
+            audio=self.cache.hash_file(variant["wav"]),
+            thumbnail=variant["thumbnail"],
+        )
+        if not self.cache.fetch(cache_key, ".mp4", variant["video"]):
+            thumbnail = (
+                render_thumbnail(variant["thumbnail"]) if variant["thumbnail"] else None
+            )
+            self.extractor.finalize_variant(variant["wav"], variant["video"], thumbnail)
+            if not os.path.exists(variant["video"]):
+                raise RuntimeError(f"Muxing wrote no video to {variant['video']}")
+            self.cache.put(cache_key, ".mp4", variant["video"])
+        os.remove(variant["wav"])
+        self.record(variant, time.perf_counter() - started)
+        return variant["id"]
+
+    # --- Run ---
+    def run(self, shards: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Process the job's shards (all by default), skipping finished variants.
+
+        Returns:
+            Dict[str, Any]: The throughput report, also written to ``report.json``.
+        """
+        manifest = self.load_manifest()
+        for directory in ("audio", "videos", "ledger"):
+            (self.job_dir / directory).mkdir(parents=True, exist_ok=True)
+        shards = range(manifest["shards"]) if shards is None else shards
+
+        transcription = manifest["transcription"]
+        pipeline = Pipeline(
+            [
+                Stage(
+                    "synthesize",
+                    lambda variant: self.synthesize(variant, transcription),
+                    workers=self.synthesis_workers,
+                    queue_size=2 * self.synthesis_workers,
+                ),
+                Stage("mux", self.mux, workers=self.mux_workers),
+            ]
+        )
+        report = {
+            "job": str(self.job_dir),
+            "variants": len(manifest["variants"]),
+            "skipped": 0,
+            "done": 0,
+            "failed": 0,
+            "seconds": 0.0,
+            "shards": [],
+            "stages": {},
+        }
+        for shard in shards:
+            done = self.completed(shard)
+            todo = [
+                variant
+                for variant in manifest["variants"]
+                if variant["shard"] == shard and variant["id"] not in done
+            ]
+            report["skipped"] += len(done)
+            if not todo:
+                continue
+
+            logging.info(
+                f"Shard {shard + 1}/{manifest['shards']}: {len(todo)} variants, "
+                f"{len(done)} already done"
+            )
+            finished = pipeline.run(todo)
+            report["done"] += len(finished)
+            report["failed"] += len(todo) - len(finished)
+            report["seconds"] += pipeline.wall_seconds
+            report["shards"].append(
+                {
+                    "shard": shard,
+                    "done": len(finished),
+                    "failed": len(todo) - len(finished),
+                    "seconds": round(pipeline.wall_seconds, 3),
+                }
+            )
+            for stage in pipeline.stages:
+                totals = report["stages"].setdefault(
+                    stage.name, {"busy_seconds": 0.0, "blocked_seconds": 0.0}
+                )
+                totals["busy_seconds"] += stage.busy_seconds
+                totals["blocked_seconds"] += stage.blocked_seconds
+                totals["utilization"] = totals["busy_seconds"] / (
+                    stage.workers * report["seconds"]
+                )
+            self.write_report(report)
+            pipeline.log_utilization()
+
+        self.write_report(report)
+        logging.info(
+            f"Bulk job done: {report['done']} written, {report['failed']} failed, "
+            f"{report['skipped']} skipped, {report['variants_per_minute']:.1f} variants/min"
+        )
+        return report
+
+    def write_report(self, report: Dict[str, Any]):
+        report["variants_per_minute"] = (
+            60 * report["done"] / report["seconds"] if report["seconds"] else 0.0
+        )
+        report["cache"] = self.cache.stats()
+        with open(self.job_dir / "report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="revocalize")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bulk = commands.add_parser(
+        "bulk", help="Personalize a template video for every row of a recipients CSV."
+    )
+    bulk.add_argument("template", help="Template video.")
+    bulk.add_argument(
+        "recipients", help="CSV with a column per template word to replace."
+    )
+    bulk.add_argument(
+        "--job-dir", required=True, help="Job state and outputs, reuse it to resume."
+    )
+    bulk.add_argument("--id-column", help="Column naming the output files.")
+    bulk.add_argument("--thumbnail-column", help="Column written on the thumbnail.")
+    bulk.add_argument("--shard-size", type=int, default=100)
+    bulk.add_argument(
+        "--shard",
+        type=int,
+        action="append",
+        help="Only process these shards, e.g. to split a job across machines.",
+    )
+    bulk.add_argument("--language", default="en")
+    bulk.add_argument("--model-name", default="openai/whisper-small")
+    bulk.add_argument("--device", default="cpu")
+    bulk.add_argument("--worker-url", default=DEFAULT_URL)
+    bulk.add_argument("--synthesis-workers", type=int, default=4)
+    bulk.add_argument("--mux-workers", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    client = ModelClient.connect(args.worker_url, device=args.device)
+    client.load_transcriber(
+        language=args.language, model_name=args.model_name, device=args.device
+    )
+    job = BulkJob(
+        args.template,
+        args.recipients,
+        args.job_dir,
+        client,
+        id_column=args.id_column,
+        thumbnail_column=args.thumbnail_column,
+        shard_size=args.shard_size,
+        synthesis_workers=args.synthesis_workers,
+        mux_workers=args.mux_workers,
+    )
+    job.run(args.shard)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# the modules in code/ import each other top-level when run from that directory (main.py),
+# and as the code package from the repository root (app3.py, revocalize.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+
+from artifact_cache import ArtifactCache
+
+
+def put_bytes(cache, key, size, tmp_path):
+    source = tmp_path / f"{key}.bin"
+    source.write_bytes(b"\0" * size)
+    return cache.put(key, ".bin", source)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=300)
+    paths = {key: put_bytes(cache, key, 100, tmp_path) for key in ("a", "b", "c")}
+    # a is read after b was written, so b is now the least recently used
+    for age, key in zip((30, 20, 10), ("a", "b", "c")):
+        mtime = paths[key].stat().st_mtime - age
+        os.utime(paths[key], (mtime, mtime))
+    assert cache.get("a", ".bin") is not None
+
+    put_bytes(cache, "d", 100, tmp_path)
+    assert cache.get("b", ".bin") is None
+    for key in ("a", "c", "d"):
+        assert cache.get(key, ".bin") is not None
+    assert cache.stats()["bytes"] == 300
+
+
+def test_replacing_an_entry_keeps_the_size(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1000)
+    put_bytes(cache, "a", 100, tmp_path)
+    put_bytes(cache, "a", 50, tmp_path)
+    assert cache.stats()["bytes"] == 50
+    assert ArtifactCache(tmp_path / "cache").stats()["bytes"] == 50
+
+
+def test_round_trips_and_counts_hits(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache")
+    assert cache.get_json("t") is None
+    cache.put_json("t", {"words": [["hi", 0.0, 0.5, 1.0]]})
+    cache.put_arrays("x", {"16000": np.arange(4, dtype=np.float32)})
+    assert cache.get_json("t") == {"words": [["hi", 0.0, 0.5, 1.0]]}
+    np.testing.assert_array_equal(cache.get_arrays("x")["16000"], np.arange(4))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_key_depends_on_every_setting():
+    base = dict(media="m", gen_text="hi", seed=None, speed=1.0, model=["F5-TTS", ""])
+    keys = {
+        ArtifactCache.key("variant", **base),
+        ArtifactCache.key("variant", **{**base, "seed": 7}),
+        ArtifactCache.key("variant", **{**base, "speed": 0.9}),
+        ArtifactCache.key("variant", **{**base, "model": ["F5-TTS", "abc"]}),
+        ArtifactCache.key("transcript", **base),
+    }
+    assert len(keys) == 5
+    assert ArtifactCache.key("variant", **base) == ArtifactCache.key("variant", **base)
+
+
+def test_file_hashes_are_remembered_up_to_a_bound(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_file_hashes=2)
+    media = []
+    for name in ("a", "b", "c"):
+        media.append(tmp_path / f"{name}.wav")
+        media[-1].write_bytes(name.encode())
+    hashes = [cache.hash_file(path) for path in media]
+    assert len(set(hashes)) == 3
+    assert len(cache._file_hashes) == 2
+    assert cache.hash_file(media[0]) == hashes[0]  # evicted, so hashed again
+    assert [key[0] for key in cache._file_hashes] == [str(media[2]), str(media[0])]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from audio_transcriber import AudioTranscriber
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture
+def transcriber():
+    transcriber = object.__new__(AudioTranscriber)
+    transcriber.chunk_length_s = 30.0
+    transcriber.chunk_overlap_s = 5.0
+    transcriber.batch_size = 8
+    return transcriber
+
+
+class FakeDecoder:
+    """Decode windows into the ground-truth segments they contain, as Whisper would.
+
+    A segment running past either edge of a window comes back cut at that edge, with
+    its text marked partial.
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.calls = []
+
+    def __call__(self, windows):
+        self.calls.append([offset for offset, _ in windows])
+        window_items = []
+        for offset, samples in windows:
+            window_end = offset + len(samples) / SAMPLE_RATE
+            items = []
+            for start, end, text in self.segments:
+                if end <= offset or start >= window_end:
+                    continue
+                if start < offset or end > window_end:
+                    items.append((max(start, offset), min(end, window_end), text + "~"))
+                else:
+                    items.append((start, end, text))
+            window_items.append(items)
+        return window_items
+
+
+def transcribe(transcriber, segments, seconds=60):
+    decode = FakeDecoder(segments)
+    audio = np.zeros(seconds * SAMPLE_RATE, dtype=np.float32)
+    merged = transcriber._transcribe_windows(audio, decode)
+    return [text for _, _, text in merged], decode
+
+
+def test_pauses_at_window_edges_need_no_extra_windows(transcriber):
+    segments = [(start, start + 5.0, f"s{start:.0f}") for start in range(0, 60, 5)]
+    texts, decode = transcribe(transcriber, segments)
+    assert texts == [text for _, _, text in segments]
+    assert decode.calls == [[0.0, 25.0, 50.0]]
+
+
+def test_segment_spanning_the_overlap_is_read_whole(transcriber):
+    # b starts before the second window and ends after the first one, so neither
+    # fixed window reads it whole
+    segments = [
+        (0.0, 10.0, "a"),
+        (10.0, 31.0, "b"),
+        (31.0, 40.0, "c"),
+        (40.0, 52.0, "d"),
+        (52.0, 60.0, "e"),
+    ]
+    texts, decode = transcribe(transcriber, segments)
+    assert texts == ["a", "b", "c", "d", "e"]
+    assert decode.calls == [[0.0, 25.0, 50.0], [10.0]]
+
+
+def test_gaps_are_decoded_in_one_batch(transcriber):
+    segments = [
+        (0.0, 20.0, "a"),
+        (20.0, 45.0, "b"),
+        (45.0, 70.0, "c"),
+        (70.0, 72.0, "d"),
+        (72.0, 90.0, "e"),
+    ]
+    texts, decode = transcribe(transcriber, segments, seconds=90)
+    assert texts == ["a", "b", "c", "d", "e"]
+    assert decode.calls == [[0.0, 25.0, 50.0, 75.0], [20.0, 45.0, 72.0]]
+
+
+def test_stitch_windows_reports_gaps(transcriber):
+    window_items = [
+        [(0.0, 10.0, "a"), (10.0, 30.0, "b~")],
+        [(25.0, 31.0, "b~"), (31.0, 40.0, "c"), (40.0, 52.0, "d")],
+    ]
+    merged, gaps = transcriber._stitch_windows(window_items, [0.0, 25.0])
+    assert [text for _, _, text in merged] == ["a", "b~", "c", "d"]
+    assert gaps == [10.0]
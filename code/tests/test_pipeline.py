@@ -0,0 +1,34 @@
+import threading
+
+from pipeline import Pipeline
+from pipeline import Stage
+
+
+def test_failing_items_are_dropped_and_counted():
+    def double(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return 2 * x
+
+    pipeline = Pipeline(
+        [Stage("double", double, workers=3), Stage("inc", lambda x: x + 1, workers=2)]
+    )
+    assert sorted(pipeline.run(range(6))) == [1, 3, 5, 9, 11]
+    stats = pipeline.utilization()
+    assert (stats["double"]["items"], stats["double"]["errors"]) == (5, 1)
+    assert (stats["inc"]["items"], stats["inc"]["errors"]) == (5, 0)
+
+
+def test_done_reaches_every_worker_and_the_pipeline_reruns():
+    before = threading.active_count()
+    pipeline = Pipeline(
+        [
+            Stage("expand", lambda n: range(n), workers=2, fan_out=True),
+            Stage("square", lambda x: x * x, workers=4, queue_size=1),
+        ]
+    )
+    # more workers than items, and an empty fan out, all still see the end of input
+    assert sorted(pipeline.run([0, 3])) == [0, 1, 4]
+    assert sorted(pipeline.run([])) == []
+    assert sorted(pipeline.run([2])) == [0, 1]
+    assert threading.active_count() == before
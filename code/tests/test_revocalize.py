@@ -0,0 +1,106 @@
+import csv
+import json
+import os
+
+import pytest
+
+import code.revocalize as revocalize
+from code.artifact_cache import ArtifactCache
+
+
+class FakeClient:
+    """Stands in for the model worker, writing each variant's text as its wav."""
+
+    def __init__(self):
+        self.synthesized = []
+
+    def transcribe(self, media, words=True):
+        return {"transcription": "Hello name, welcome."}
+
+    def synthesize(self, media, ref_text, gen_texts, file_waves, **kwargs):
+        for gen_text, file_wave in zip(gen_texts, file_waves):
+            self.synthesized.append(gen_text)
+            with open(file_wave, "w", encoding="utf-8") as f:
+                f.write(gen_text)
+            yield {"index": 0, "file_wave": file_wave}
+
+
+class FakeExtractor:
+    """Stands in for FFmpeg, copying the wav to the video unless told to fail."""
+
+    def __init__(self, template, output_audio):
+        self.write = True
+
+    def finalize_variant(self, new_audio, output_video, thumbnail=None):
+        if self.write:
+            with (
+                open(new_audio, encoding="utf-8") as f,
+                open(output_video, "w", encoding="utf-8") as out,
+            ):
+                out.write(f.read())
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(revocalize, "AudioExtractor", FakeExtractor)
+    monkeypatch.setattr(
+        revocalize, "ArtifactCache", lambda: ArtifactCache(tmp_path / "cache")
+    )
+    template = tmp_path / "template.mp4"
+    template.write_bytes(b"template")
+    recipients = tmp_path / "recipients.csv"
+    with open(recipients, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name"])
+        writer.writerows([["Ann"], ["Bob"], ["Cy"], ["Dee"]])
+
+    def make_job():
+        return revocalize.BulkJob(
+            str(template),
+            str(recipients),
+            str(tmp_path / "job"),
+            FakeClient(),
+            shard_size=2,
+        )
+
+    return make_job
+
+
+def test_resumed_run_skips_finished_variants(job):
+    first = job()
+    report = first.run()
+    assert report["done"] == 4 and report["skipped"] == 0
+    assert sorted(first.client.synthesized) == [
+        f"Hello {name}, welcome." for name in ("Ann", "Bob", "Cy", "Dee")
+    ]
+
+    manifest = first.load_manifest()
+    os.remove(manifest["variants"][2]["video"])
+    second = job()
+    report = second.run()
+    assert (report["done"], report["skipped"]) == (1, 3)
+    assert second.client.synthesized == ["Hello Cy, welcome."]
+
+    third = job()
+    report = third.run()
+    assert (report["done"], report["skipped"]) == (0, 4)
+    assert third.client.synthesized == []
+
+
+def test_completed_ignores_torn_lines_and_missing_videos(job):
+    bulk = job()
+    bulk.run()
+    manifest = bulk.load_manifest()
+    os.remove(manifest["variants"][1]["video"])
+    with open(bulk.ledger_path(0), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": 9, "video": manifest["variants"][0]["video"]})[:10])
+    assert bulk.completed(0) == {0}
+    assert bulk.completed(1) == {2, 3}
+
+
+def test_variant_without_a_video_is_not_recorded(job):
+    bulk = job()
+    bulk.extractor.write = False
+    report = bulk.run()
+    assert (report["done"], report["failed"]) == (0, 4)
+    assert all(bulk.completed(shard) == set() for shard in (0, 1))
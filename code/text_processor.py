@@ -3,9 +3,12 @@ import spacy
 import subprocess
 import sys
 import re
+from functools import lru_cache
 
 
-# Function to download and load the appropriate spaCy language model for a given language code
+# Function to download and load the appropriate spaCy language model for a given language code,
+# cached so a long-running process (the model worker) loads each model once
+@lru_cache(maxsize=None)
 def load_spacy_model(lang_code) -> spacy.language.Language:
     lang_model = f"{lang_code}_core_web_sm"
 
@@ -20,10 +23,11 @@ def load_spacy_model(lang_code) -> spacy.language.Language:
         return spacy.load(lang_model)
 
 
-# Function to process text and extract nouns, pronouns, and other tokens
+# Function to process text and extract nouns, pronouns, and other tokens,
+# the language given by its name ("English") or its code ("en") like the transcriber's
 def process_text(text, language) -> {list, list}:
     # Load the appropriate spaCy model for the specified language
-    nlp = load_spacy_model(whisper_languages[language])
+    nlp = load_spacy_model(whisper_languages.get(language, language))
 
     # Remove punctuation and special characters from the text
     text = re.sub(r"[^\w\s]", "", text)
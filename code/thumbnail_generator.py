@@ -1,5 +1,6 @@
 from PIL import Image, ImageDraw, ImageFont
 import imageio_ffmpeg as ffmpeg
+import io
 import shutil
 import os
 import logging
@@ -16,18 +17,21 @@ warnings.filterwarnings("ignore")
 
 ffmpeg_path = ffmpeg.get_ffmpeg_exe()
 
-def generate_thumbnail(output_image: str, text: str, base_image: str):
+def render_thumbnail(text: str, base_image: str = "data/inputs/background.png") -> bytes:
     """
-    Generates a thumbnail image with text centered and font size adjusted dynamically.
+    Renders a thumbnail image with text centered and font size adjusted dynamically.
 
     Parameters:
     -----------
-    base_image : str
-        Path to the base image to use as a thumbnail.
-    output_image : str
-        Path to save the generated thumbnail image.
     text : str
         Text to overlay on the thumbnail.
+    base_image : str
+        Path to the base image to use as a thumbnail.
+
+    Returns:
+    --------
+    bytes
+        The thumbnail encoded as PNG, ready to be written or piped to FFmpeg.
     """
     try:
         # Load the base image
@@ -56,14 +60,33 @@ def generate_thumbnail(output_image: str, text: str, base_image: str):
         # Draw text on the image
         draw.text(text_position, text, fill="black",stroke_width=2, stroke_fill="white" , font=font)
 
-        # Save the modified image
-        img.save(output_image)
-        logging.info(f"Thumbnail image generated: {output_image}")
+        # Encode the modified image
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
     except Exception as e:
         logging.error(f"Error generating thumbnail: {e}")
         raise
 
 
+def generate_thumbnail(output_image: str, text: str, base_image: str):
+    """
+    Generates a thumbnail image with text centered and font size adjusted dynamically.
+
+    Parameters:
+    -----------
+    base_image : str
+        Path to the base image to use as a thumbnail.
+    output_image : str
+        Path to save the generated thumbnail image.
+    text : str
+        Text to overlay on the thumbnail.
+    """
+    with open(output_image, "wb") as f:
+        f.write(render_thumbnail(text, base_image))
+    logging.info(f"Thumbnail image generated: {output_image}")
+
+
 def add_thumbnail_to_video(text: str, output_video: str, base_image: str = "data/inputs/background.png"):
     """
     Embeds the generated thumbnail into the video.